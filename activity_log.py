@@ -0,0 +1,164 @@
+"""Buffered writer for ``Log`` rows.
+
+In ``async`` mode (the default) views hand log rows to an in-process buffer and
+return immediately; a background thread bulk-inserts them every
+``flush_interval`` seconds or as soon as ``batch_size`` rows are waiting. The
+buffer is bounded: when it is full, ``emit`` waits up to ``block_timeout`` seconds
+for room and then drops the row, and every drop is counted. Remaining rows are
+flushed when the process exits.
+
+In ``sync`` mode (for tests) the row is added to the caller's session and
+committed together with the rest of the request, as before.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from database import db
+from models import Log
+
+logger = logging.getLogger(__name__)
+
+# What ``emit`` did with the row
+LOG_IN_SESSION = 'session'  # added to the caller's session, committed with the request
+LOG_QUEUED = 'queued'       # buffered, written by the flusher thread
+LOG_DROPPED = 'dropped'     # buffer full, the row is lost
+
+
+class ActivityLogSink:
+    def __init__(self, app, batch_size: int = 500, flush_interval: float = 0.2,
+                 max_buffer: int = 10000, block_timeout: float = 0.0,
+                 daily_task: Optional[Callable[[], Any]] = None):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.block_timeout = block_timeout
+        # Run by the flusher thread (inside an app context) once per UTC day
+        self.daily_task = daily_task
+        self._daily_task_day = None
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._buffer = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    @property
+    def mode(self) -> str:
+        return self.app.config.get('ACTIVITY_LOG_MODE', 'async')
+
+    def emit(self, user_id: int, action: str, course_id: Optional[int] = None) -> str:
+        """Record an activity. Returns ``LOG_IN_SESSION``, ``LOG_QUEUED`` or ``LOG_DROPPED``."""
+        row = {'user_id': user_id, 'course_id': course_id, 'action': action, 'timestamp': datetime.utcnow()}
+        if self.mode == 'sync':
+            db.session.add(Log(**row))
+            return LOG_IN_SESSION
+
+        self._ensure_started()
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer and self.block_timeout > 0:
+                # Backpressure: give the flusher a chance to make room
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: len(self._buffer) < self.max_buffer, timeout=self.block_timeout)
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return LOG_DROPPED
+            self._buffer.append(row)
+            self.emitted += 1
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return LOG_QUEUED
+
+    def _ensure_started(self):
+        if os.getpid() != self._pid:
+            # Forked worker: the parent's buffer and thread do not belong to us
+            self._reset()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name='activity-log-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or len(self._buffer) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+            self._run_daily_task()
+
+    def _run_daily_task(self):
+        today = datetime.utcnow().date()
+        if self.daily_task is None or self._daily_task_day == today:
+            return
+        self._daily_task_day = today
+        try:
+            with self.app.app_context():
+                self.daily_task()
+        except Exception as exc:
+            logger.warning('Tác vụ hằng ngày của activity log thất bại: %s', exc)
+
+    def flush(self) -> int:
+        """Write every buffered row now. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._cond:
+                rows = list(self._buffer)
+                self._buffer.clear()
+                self._cond.notify_all()
+            if not rows:
+                return 0
+            written = 0
+            with self.app.app_context():
+                for start in range(0, len(rows), self.batch_size):
+                    batch = rows[start:start + self.batch_size]
+                    try:
+                        with db.engine.begin() as conn:
+                            conn.execute(Log.__table__.insert(), batch)
+                        written += len(batch)
+                    except Exception as exc:
+                        self.failed += len(batch)
+                        logger.warning('Không thể ghi %d log hoạt động: %s', len(batch), exc)
+            self.written += written
+            self.flushes += 1
+            return written
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the flusher and write whatever is still buffered."""
+        thread = self._thread
+        if thread is not None and thread.is_alive() and os.getpid() == self._pid:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify_all()
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'mode': self.mode,
+                'buffered': len(self._buffer),
+                'emitted': self.emitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'flushes': self.flushes,
+            }
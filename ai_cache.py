@@ -0,0 +1,130 @@
+"""Bounded LRU + TTL cache with single-flight coalescing for AI chat responses."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+def normalize_message(message: str) -> str:
+    """Lower-case and collapse whitespace so trivially different questions share a key."""
+    return ' '.join(message.lower().split())
+
+
+def make_cache_key(message: str, role: str, profile_text: str) -> Tuple[str, str, str]:
+    profile_hash = hashlib.sha256(profile_text.encode('utf-8')).hexdigest()
+    return normalize_message(message), role, profile_hash
+
+
+class _Flight:
+    """An upstream call in progress that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    ``get_or_compute`` makes sure only one ``compute`` call per key is in flight:
+    concurrent callers for the same key wait for the first one and share its result.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _lookup(self, key):
+        # Caller must hold the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key) -> Tuple[bool, Any]:
+        with self._lock:
+            return self._lookup(key)
+
+    def set(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_compute(self, key, compute: Callable[[], Any],
+                       should_cache: Callable[[Any], bool] = lambda value: True) -> Tuple[Any, str]:
+        """Return ``(value, status)`` where status is ``'hit'``, ``'coalesced'`` or ``'miss'``."""
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value, 'hit'
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, 'coalesced'
+
+        try:
+            flight.value = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        else:
+            # Store before releasing the flight so late arrivals see the entry
+            if should_cache(flight.value):
+                self.set(key, flight.value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+        return flight.value, 'miss'
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
@@ -0,0 +1,184 @@
+"""Shared Gemini client: bounded executor, hard deadlines and a circuit breaker.
+
+The SDK module is passed in (``google.generativeai`` in production), so a fake
+module whose model returns a list of chunks can be used instead.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised when the breaker is open and the upstream must not be called."""
+
+
+class UpstreamBusyError(Exception):
+    """Raised when every executor slot is taken."""
+
+
+class UpstreamTimeoutError(Exception):
+    """Raised when the upstream did not answer within the deadline."""
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    While open, one trial call is let through every ``reset_timeout`` seconds; a
+    success closes the breaker again and a failure keeps it open.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = self._clock()
+            if now - self._opened_at >= self.reset_timeout:
+                # Let this call through as the trial; others wait for the next window
+                self._opened_at = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+class GeminiClient:
+    """Configures the SDK once and reuses one ``GenerativeModel`` for all requests.
+
+    Upstream calls run on a small thread pool. At most ``max_pending`` calls may be
+    running or queued; beyond that callers get ``UpstreamBusyError`` right away
+    instead of tying up a request worker.
+    """
+
+    def __init__(self, sdk, api_key: str, model_name: str, timeout: float = 20.0,
+                 max_workers: int = 4, max_pending: int = 8,
+                 breaker: Optional[CircuitBreaker] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.sdk = sdk
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gemini')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                self.sdk.configure(api_key=self.api_key)
+                self._model = self.sdk.GenerativeModel(self.model_name)
+            return self._model
+
+    def _submit(self, fn, *args):
+        if not self.breaker.allow():
+            raise CircuitOpenError('Gemini API tạm thời bị ngắt do lỗi liên tiếp')
+        if not self._slots.acquire(blocking=False):
+            raise UpstreamBusyError('Gemini API đang quá tải')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _generate(self, prompt, kwargs, retry_kwargs):
+        model = self._get_model()
+        try:
+            return model.generate_content(prompt, **kwargs)
+        except Exception:
+            if retry_kwargs is None:
+                raise
+            return model.generate_content(prompt, **{**kwargs, **retry_kwargs})
+
+    def generate(self, prompt: str, retry_kwargs: Optional[Dict[str, Any]] = None, **kwargs):
+        """Blocking call bounded by ``timeout``; ``retry_kwargs`` are merged in for one retry."""
+        future = self._submit(self._generate, prompt, kwargs, retry_kwargs)
+        try:
+            response = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.breaker.record_failure()
+            raise UpstreamTimeoutError(f'Gemini API không phản hồi sau {self.timeout:g} giây')
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield text chunks as they arrive; the whole stream must finish within ``timeout``."""
+        chunks: 'queue.Queue' = queue.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for chunk in self._get_model().generate_content(prompt, stream=True, **kwargs):
+                    if cancelled.is_set():
+                        return
+                    text = getattr(chunk, 'text', None)
+                    if text:
+                        chunks.put(('chunk', text))
+                chunks.put(('done', None))
+            except Exception as exc:
+                chunks.put(('error', exc))
+
+        self._submit(produce)
+        deadline = self._clock() + self.timeout
+        try:
+            while True:
+                remaining = deadline - self._clock()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    kind, value = chunks.get(timeout=remaining)
+                except queue.Empty:
+                    raise UpstreamTimeoutError(f'Gemini API không phản hồi sau {self.timeout:g} giây')
+                if kind == 'chunk':
+                    yield value
+                elif kind == 'done':
+                    self.breaker.record_success()
+                    return
+                else:
+                    raise value
+        except GeneratorExit:
+            # Client went away: stop the producer, but it is not an upstream failure
+            cancelled.set()
+            raise
+        except Exception:
+            cancelled.set()
+            self.breaker.record_failure()
+            raise
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
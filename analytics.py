@@ -1,9 +1,16 @@
-import pandas as pd
+import logging
+import os
+import threading
 from typing import Optional, Dict, Any
 
+logger = logging.getLogger(__name__)
+
 
 def load_sales_data_summary(excel_path: str) -> Optional[Dict[str, Any]]:
     try:
+        # pandas is only needed here; importing it lazily keeps worker start-up fast
+        import pandas as pd
+
         df = pd.read_excel(excel_path)
         if df.empty:
             return None
@@ -21,3 +28,46 @@ def load_sales_data_summary(excel_path: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+class SalesSummaryCache:
+    """``load_sales_data_summary`` memoized on the workbook's (path, mtime, size).
+
+    The workbook is parsed in a background thread, never in the request that
+    notices it is new or changed: until the parse finishes, ``get`` returns the
+    previous summary (or None on first use).
+    """
+
+    def __init__(self, path: str, loader=load_sales_data_summary):
+        self.path = path
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._key = None
+        self._summary: Optional[Dict[str, Any]] = None
+        self._loading = None  # key being parsed
+
+    def _stat_key(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return self.path, st.st_mtime_ns, st.st_size
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        key = self._stat_key()
+        with self._lock:
+            if key is None:
+                self._key, self._summary = None, None
+                return None
+            if key != self._key and key != self._loading:
+                self._loading = key
+                threading.Thread(target=self._load, args=(key,), name='sales-summary', daemon=True).start()
+            return self._summary
+
+    def _load(self, key) -> None:
+        try:
+            summary = self._loader(self.path)
+        except Exception:
+            logger.exception('Could not summarize %s', self.path)
+            summary = None
+        with self._lock:
+            if self._loading == key:
+                self._key, self._summary, self._loading = key, summary, None
@@ -1,23 +1,50 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context, abort, send_file
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from database import db, migrate
+from database import db, migrate, engine_options, sqlite_pragmas, apply_sqlite_pragmas, REPLICA_BIND
+from db_routing import ReadRouter, read_replica
 from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from datetime import datetime, timedelta
 import random
 from importlib import import_module
 from forms import LoginForm, RegisterForm, CourseForm, AssignmentForm, SubmissionForm
+from ai_cache import ResponseCache, make_cache_key
+from ai_client import GeminiClient, CircuitBreaker
+from profiles import ProfileSnapshots
+from activity_log import ActivityLogSink, LOG_DROPPED
+from rollups import action_counts, roll_up_logs, archive_logs
+from trends import MonthlyTrendCache
+from search import search as search_index_lookup, rebuild_search_index, create_search_index
+from uploads import BlobStore, UploadRequest, send_upload
+from bulk import read_csv_rows, json_rows, student_ref, apply_grades, apply_enrollments
+from datagen import DatasetGenerator, parse_count
+from sql_metrics import SQLMetrics
+from request_profiler import RequestProfiler
 from dotenv import load_dotenv
 load_dotenv()
 from werkzeug.utils import secure_filename
-import uuid
+from sqlalchemy.orm import joinedload
+from jinja2 import FileSystemBytecodeCache
+import click
+import functools
+import json
+import threading
+import time
+
+
+@functools.lru_cache(maxsize=None)
+def load_genai():
+    """google.generativeai, or None if not installed. Imported on first use: the SDK
+    (grpc, protobuf) takes seconds to import and most requests never need it."""
+    try:
+        import google.generativeai as genai
+    except (ImportError, AttributeError):  # pragma: no cover - optional dependency
+        return None
+    return genai
+
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except (ImportError, AttributeError):  # pragma: no cover - optional dependency
-    GEMINI_AVAILABLE = False
-    genai = None
+# Upper bound for ?limit= on /api/stats
+API_STATS_MAX_LIMIT = 1000
 
 
 def create_app() -> Flask:
@@ -29,31 +56,230 @@ def create_app() -> Flask:
     db_path = os.environ.get('DATABASE_URL') or 'sqlite:///lms.db'
     app.config['SQLALCHEMY_DATABASE_URI'] = db_path
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Connection pool (threaded servers: one connection per busy thread)
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    # SQLite: WAL để đọc không bị chặn bởi ghi; chờ khóa tối đa SQLITE_BUSY_TIMEOUT ms thay vì lỗi "database is locked"
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -65536))  # âm = KiB, tức 64 MiB
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    app.config['SQLITE_FOREIGN_KEYS'] = os.environ.get('SQLITE_FOREIGN_KEYS', '1').lower() in ('1', 'true', 'yes')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    # CSDL chỉ đọc (replica, hoặc sqlite:///file:lms.db?mode=ro&uri=true) cho các trang @read_replica
+    app.config['DATABASE_READ_URL'] = os.environ.get('DATABASE_READ_URL', '')
+    app.config['DB_REPLICA_MAX_LAG'] = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+    app.config['DB_REPLICA_CHECK_INTERVAL'] = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 10))
+    if app.config['DATABASE_READ_URL']:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: app.config['DATABASE_READ_URL']}
     # File upload config
     app.config['UPLOAD_FOLDER'] = os.path.join(app.instance_path, 'uploads')
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB limit
+    # Internal nginx location mapped to UPLOAD_FOLDER (X-Accel-Redirect); empty = send from Flask
+    app.config['UPLOAD_ACCEL_PREFIX'] = os.environ.get('UPLOAD_ACCEL_PREFIX', '')
+    # Apache/lighttpd: X-Sendfile
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    # AI chat config
+    app.config['GEMINI_MODEL'] = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash')
+    app.config['AI_CACHE_MAX_ENTRIES'] = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 512))
+    app.config['AI_CACHE_TTL'] = float(os.environ.get('AI_CACHE_TTL', 300))
+    app.config['AI_TIMEOUT'] = float(os.environ.get('AI_TIMEOUT', 20))  # hard deadline per upstream call (s)
+    app.config['AI_MAX_WORKERS'] = int(os.environ.get('AI_MAX_WORKERS', 4))
+    app.config['AI_MAX_PENDING'] = int(os.environ.get('AI_MAX_PENDING', 16))
+    app.config['AI_BREAKER_THRESHOLD'] = int(os.environ.get('AI_BREAKER_THRESHOLD', 5))
+    app.config['AI_BREAKER_RESET'] = float(os.environ.get('AI_BREAKER_RESET', 30))
+    app.config['AI_PROFILE_TTL'] = float(os.environ.get('AI_PROFILE_TTL', 120))
+    # Người dùng đăng nhập được cache trong mỗi worker, xóa khi sửa/xóa người dùng; TTL giới hạn độ trễ giữa các worker
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+    app.config['USER_CACHE_MAX_ENTRIES'] = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 4096))
+    # Số liệu trang chủ: cache DASHBOARD_TTL giây, xóa khi commit thay đổi người dùng/khóa học/đăng ký
+    app.config['DASHBOARD_TTL'] = float(os.environ.get('DASHBOARD_TTL', 30))
+    # Tóm tắt bảng tính trên trang chủ, đọc lại (trong nền) khi tệp thay đổi
+    app.config['SALES_DATA_PATH'] = os.environ.get('SALES_DATA_PATH', 'DuLieu_BanHang.xlsx')
+    # Số liệu của tháng hiện tại được tính lại sau TTL này; các tháng đã qua được cache luôn
+    app.config['TRENDS_CURRENT_MONTH_TTL'] = float(os.environ.get('TRENDS_CURRENT_MONTH_TTL', 60))
+    app.config['GRADEBOOK_PAGE_SIZE'] = int(os.environ.get('GRADEBOOK_PAGE_SIZE', 50))
+    app.config['SEARCH_RESULT_LIMIT'] = int(os.environ.get('SEARCH_RESULT_LIMIT', 20))
+    # Activity log writer: 'async' (buffered, bulk insert) or 'sync' (same transaction, for tests)
+    app.config['ACTIVITY_LOG_MODE'] = os.environ.get('ACTIVITY_LOG_MODE', 'async')
+    app.config['ACTIVITY_LOG_BATCH_SIZE'] = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', 500))
+    app.config['ACTIVITY_LOG_FLUSH_INTERVAL'] = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', 0.2))
+    app.config['ACTIVITY_LOG_MAX_BUFFER'] = int(os.environ.get('ACTIVITY_LOG_MAX_BUFFER', 10000))
+    app.config['ACTIVITY_LOG_BLOCK_TIMEOUT'] = float(os.environ.get('ACTIVITY_LOG_BLOCK_TIMEOUT', 0))
+    # Raw Log rows older than this are moved to LOG_ARCHIVE_DIR by `flask archive-logs`
+    app.config['LOG_RETENTION_DAYS'] = int(os.environ.get('LOG_RETENTION_DAYS', 180))
+    app.config['LOG_ARCHIVE_DIR'] = os.environ.get('LOG_ARCHIVE_DIR') or os.path.join(app.instance_path, 'log_archive')
+    # Đếm/đo thời gian SQL mỗi request (header Server-Timing); một câu lệnh cùng dạng chạy quá
+    # SQL_NPLUS1_THRESHOLD lần trong một request bị cảnh báo là N+1, hoặc báo lỗi khi SQL_STRICT=1 (test)
+    app.config['SQL_METRICS'] = os.environ.get('SQL_METRICS', '1').lower() in ('1', 'true', 'yes')
+    app.config['SQL_NPLUS1_THRESHOLD'] = int(os.environ.get('SQL_NPLUS1_THRESHOLD', 10))
+    app.config['SQL_STRICT'] = os.environ.get('SQL_STRICT', '').lower() in ('1', 'true', 'yes')
+    # Giảng viên thêm ?_profile=1 (hoặc header X-Profile: 1) để profile một request; xem tại /request-profiles
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 50))
+    app.config['PROFILE_SAMPLE_INTERVAL'] = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+    # Template đã biên dịch được lưu ra đĩa, dùng chung giữa các worker; để trống để tắt
+    app.config['JINJA_CACHE_DIR'] = os.environ.get('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
     # Ensure instance and upload directories exist
     try:
         os.makedirs(app.instance_path, exist_ok=True)
         os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        if app.config['JINJA_CACHE_DIR']:
+            os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
     except Exception:
         pass
 
+    if app.config['JINJA_CACHE_DIR'] and os.path.isdir(app.config['JINJA_CACHE_DIR']):
+        # Must be set before app.jinja_env is first used
+        app.jinja_options = dict(app.jinja_options,
+                                 bytecode_cache=FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR']))
+
+    # Bài nộp được lưu theo SHA-256 nội dung (trùng nội dung chỉ lưu một lần)
+    app.request_class = UploadRequest
+    upload_store = BlobStore(app.config['UPLOAD_FOLDER'])
+    app.extensions['upload_store'] = upload_store
+
     # Init extensions
     db.init_app(app)
     migrate.init_app(app, db)
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        apply_sqlite_pragmas(engine, sqlite_pragmas(app.config, read_only=key == REPLICA_BIND))
+    if REPLICA_BIND in engines:
+        app.extensions['db_router'] = ReadRouter(app, engines[REPLICA_BIND],
+                                                 max_lag=app.config['DB_REPLICA_MAX_LAG'],
+                                                 check_interval=app.config['DB_REPLICA_CHECK_INTERVAL'])
+
+    if app.config['SQL_METRICS']:
+        app.extensions['sql_metrics'] = SQLMetrics(app, engines.values(),
+                                                   threshold=app.config['SQL_NPLUS1_THRESHOLD'],
+                                                   strict=app.config['SQL_STRICT'])
+
+    # Cache phản hồi AI dùng chung trong process (LRU + TTL, gộp các request trùng nhau)
+    ai_response_cache = ResponseCache(maxsize=app.config['AI_CACHE_MAX_ENTRIES'],
+                                      ttl=app.config['AI_CACHE_TTL'])
+    app.extensions['ai_response_cache'] = ai_response_cache
+    gemini_client_lock = threading.Lock()
+
+    # Profile của người dùng cho trợ lý AI, xóa khi có thay đổi điểm/bài nộp/đăng ký
+    profile_snapshots = ProfileSnapshots(ttl=app.config['AI_PROFILE_TTL'])
+    app.extensions['profile_snapshots'] = profile_snapshots
+
+    monthly_trends = MonthlyTrendCache(current_ttl=app.config['TRENDS_CURRENT_MONTH_TTL'])
+    app.extensions['monthly_trends'] = monthly_trends
+
+    activity_log = ActivityLogSink(
+        app,
+        batch_size=app.config['ACTIVITY_LOG_BATCH_SIZE'],
+        flush_interval=app.config['ACTIVITY_LOG_FLUSH_INTERVAL'],
+        max_buffer=app.config['ACTIVITY_LOG_MAX_BUFFER'],
+        block_timeout=app.config['ACTIVITY_LOG_BLOCK_TIMEOUT'],
+        daily_task=roll_up_logs,
+    )
+    app.extensions['activity_log'] = activity_log
 
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = 'login'
 
+    request_profiler = RequestProfiler(app, app.config['PROFILE_DIR'], keep=app.config['PROFILE_KEEP'],
+                                       interval=app.config['PROFILE_SAMPLE_INTERVAL'])
+    app.extensions['request_profiler'] = request_profiler
+
     # Defer imports to avoid circular deps
-    from models import User, Course, Enrollment, Assignment, Submission, Log
-    from analytics import load_sales_data_summary
+    from models import User, Course, Enrollment, Assignment, Submission, Log, StudentStats
+    from analytics import SalesSummaryCache
+    from dashboard import DashboardCounters
+    from queries import teacher_analytics_summary, user_activity_rows, user_activity_averages, gradebook_page, \
+        GRADEBOOK_SORTS, \
+        course_counts, course_submission_stats
+    from stats import (get_student_stats, load_student_stats, record_login, record_submission,
+                       record_grade, record_enrollment, rebuild_student_stats)
+    from user_cache import UserCache
+
+    user_cache = UserCache(app, maxsize=app.config['USER_CACHE_MAX_ENTRIES'], ttl=app.config['USER_CACHE_TTL'])
+    app.extensions['user_cache'] = user_cache
+    dashboard_counters = DashboardCounters(ttl=app.config['DASHBOARD_TTL'])
+    app.extensions['dashboard_counters'] = dashboard_counters
+    sales_summary_cache = SalesSummaryCache(app.config['SALES_DATA_PATH'])
+    app.extensions['sales_summary'] = sales_summary_cache
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Backfill the StudentStats rollup table from the raw tables."""
+        count = rebuild_student_stats()
+        print(f"Rebuilt StudentStats for {count} users.")
+
+    @app.cli.command('rollup-logs')
+    def rollup_logs_command():
+        """Roll up new Log rows into the daily LogDailyRollup table."""
+        count = roll_up_logs()
+        print(f"Rolled up {count} log rows.")
+
+    @app.cli.command('archive-logs')
+    @click.option('--days', type=int, default=None, help='Retention window in days (default: LOG_RETENTION_DAYS).')
+    @click.option('--directory', default=None, help='Archive directory (default: LOG_ARCHIVE_DIR).')
+    def archive_logs_command(days, directory):
+        """Move Log rows older than the retention window into gzip CSV archives."""
+        days = days if days is not None else app.config['LOG_RETENTION_DAYS']
+        directory = directory or app.config['LOG_ARCHIVE_DIR']
+        cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=days), datetime.min.time())
+        result = archive_logs(cutoff, directory)
+        print(f"Archived {result['rows']} log rows from {result['days']} days before {cutoff:%Y-%m-%d} into {directory}.")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Create (if needed) and refill the FTS5 search index."""
+        with db.engine.begin() as conn:
+            if not create_search_index(conn):
+                print("FTS5 is not available on this database; /search uses LIKE.")
+                return
+            count = rebuild_search_index(conn)
+        print(f"Indexed {count} users, courses and assignments.")
+
+    def count_option(ctx, param, value):
+        try:
+            return parse_count(value)
+        except ValueError as exc:
+            raise click.BadParameter(str(exc))
+
+    @app.cli.command('gen-data')
+    @click.option('--students', default='1000', callback=count_option, help='Number of students (e.g. 50k).')
+    @click.option('--courses', default='50', callback=count_option, help='Number of courses.')
+    @click.option('--teachers', default=None, type=int, help='Number of teachers (default: courses / 10).')
+    @click.option('--logs', default='100k', callback=count_option,
+                  help='Login/view log rows, on top of one log per submission (e.g. 10M).')
+    @click.option('--seed', default=42, show_default=True, help='Random seed; same seed, same data.')
+    @click.option('--batch-size', default=10000, show_default=True, help='Rows per executemany.')
+    @click.option('--reset', is_flag=True, help='Drop and recreate all tables first.')
+    def gen_data_command(students, courses, teachers, logs, seed, batch_size, reset):
+        """Generate a large, reproducible synthetic dataset with bulk inserts."""
+        if students < 1 or courses < 1:
+            raise click.BadParameter('need at least one student and one course')
+        if reset:
+            db.drop_all()
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            raise click.ClickException('Database is not empty; run with --reset to replace it.')
+        db.session.rollback()
+
+        generator = DatasetGenerator(students=students, courses=courses, logs=logs, seed=seed,
+                                     teachers=teachers or max(1, courses // 10))
+        started = time.perf_counter()
+        click.echo(f'Generating data (seed {seed}):')
+        with db.engine.begin() as conn:
+            generator.write(conn, batch_size=batch_size, echo=click.echo)
+        click.echo(f'  inserted in {time.perf_counter() - started:.1f}s')
+        click.echo(f'  rolled up {roll_up_logs()} log rows')
+        click.echo(f'  rebuilt StudentStats for {rebuild_student_stats()} users')
+        click.echo(f'Done in {time.perf_counter() - started:.1f}s.')
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
 
     def create_sample_data():
         """Create comprehensive sample data for real-world classroom"""
@@ -245,6 +471,8 @@ def create_app() -> Flask:
             db.session.add_all(logs)
             db.session.commit()
             
+            profile_snapshots.clear()
+            monthly_trends.clear()  # sample logs are backdated into earlier months
             print("Comprehensive sample data created successfully!")
             print(f"Created: {len(users)} users, {len(courses)} courses, {len(assignments)} assignments")
             print(f"Created: {len(enrollments)} enrollments, {len(submissions)} submissions, {len(logs)} logs")
@@ -253,76 +481,10 @@ def create_app() -> Flask:
             print(f"Error creating sample data: {e}")
 
     def get_student_learning_profile(user):
-        submissions = Submission.query.filter_by(student_id=user.id).all()
-        scores = [s.score for s in submissions if s.score is not None]
-        avg_score = sum(scores) / len(scores) if scores else None
-
-        login_count = Log.query.filter_by(user_id=user.id, action='login').count()
-        assignments_completed = len(scores)
-        courses_enrolled = Enrollment.query.filter_by(user_id=user.id).count()
-
-        recent_topics = []
-        for submission in sorted(submissions, key=lambda s: s.id, reverse=True):
-            assignment = submission.assignment
-            if assignment and assignment.title not in recent_topics:
-                recent_topics.append(assignment.title)
-            if len(recent_topics) >= 5:
-                break
-
-        return {
-            'avg_score': round(avg_score, 1) if avg_score is not None else None,
-            'login_count': login_count,
-            'assignments_completed': assignments_completed,
-            'courses_enrolled': courses_enrolled,
-            'recent_topics': recent_topics,
-        }
+        return profile_snapshots.student(user.id)
 
     def get_teacher_overview_profile(user):
-        courses = Course.query.filter_by(teacher_id=user.id).all()
-        course_ids = [course.id for course in courses]
-
-        total_students = 0
-        avg_scores = []
-        course_summaries = []
-
-        for course in courses:
-            enrollment_count = Enrollment.query.filter_by(course_id=course.id).count()
-            total_students += enrollment_count
-
-            assignments = Assignment.query.filter_by(course_id=course.id).all()
-            assignment_ids = [assignment.id for assignment in assignments]
-            if assignment_ids:
-                course_scores = [
-                    submission.score for submission in Submission.query.filter(Submission.assignment_id.in_(assignment_ids)).all()
-                    if submission.score is not None
-                ]
-            else:
-                course_scores = []
-
-            if course_scores:
-                avg_scores.append(sum(course_scores) / len(course_scores))
-
-            course_summaries.append(
-                f"{course.name}: {enrollment_count} sinh viên, {len(assignments)} bài tập"
-            )
-
-        recent_logs = Log.query.filter(Log.course_id.in_(course_ids)).order_by(Log.timestamp.desc()).limit(5).all() if course_ids else []
-
-        return {
-            'courses': [course.name for course in courses],
-            'total_students': total_students,
-            'avg_score': round(sum(avg_scores) / len(avg_scores), 1) if avg_scores else None,
-            'course_summaries': course_summaries,
-            'recent_events': [
-                {
-                    'action': log.action,
-                    'user_id': log.user_id,
-                    'course_id': log.course_id,
-                    'timestamp': log.timestamp.isoformat() if log.timestamp else None,
-                }
-                for log in recent_logs
-            ],
-        }
+        return profile_snapshots.teacher(user.id)
 
     def format_profile_for_prompt(profile):
         lines = []
@@ -392,24 +554,50 @@ def create_app() -> Flask:
             return base
 
     def call_external_ai_model(user_message, role, profile):
-        if not GEMINI_AVAILABLE:
-            return None, 'Google Generative AI SDK chưa được cài đặt. Hãy cài đặt bằng: pip install google-generativeai'
+        """Trả về (text, error, cache_status); cache_status là 'hit', 'coalesced', 'miss' hoặc 'bypass'."""
+        if load_genai() is None:
+            return None, 'Google Generative AI SDK chưa được cài đặt. Hãy cài đặt bằng: pip install google-generativeai', 'bypass'
 
         api_key = os.environ.get('GEMINI_API_KEY')
         if not api_key:
-            return None, 'Biến môi trường GEMINI_API_KEY chưa được cấu hình. Vui lòng thêm API key vào file .env'
-
-        try:
-            genai.configure(api_key=api_key)
-        except Exception as exc:  # pragma: no cover - defensive
-            app.logger.warning('Không thể cấu hình Gemini API: %s', exc)
-            return None, str(exc)
+            return None, 'Biến môi trường GEMINI_API_KEY chưa được cấu hình. Vui lòng thêm API key vào file .env', 'bypass'
 
-        # Chỉ sử dụng một model duy nhất: gemini-2.5-flash
-        model_name = 'gemini-2.5-flash'
-        
         profile_text = format_profile_for_prompt(profile)
-        
+
+        # Câu hỏi giống nhau (cùng role, cùng profile) dùng chung một lần gọi API
+        key = make_cache_key(user_message, role, profile_text)
+        (response_text, error), cache_status = ai_response_cache.get_or_compute(
+            key,
+            lambda: generate_gemini_response(api_key, user_message, role, profile_text),
+            should_cache=lambda result: result[0] is not None,
+        )
+        return response_text, error, cache_status
+
+    def get_gemini_client(api_key):
+        """GeminiClient dùng chung: chỉ cấu hình SDK và tạo GenerativeModel một lần."""
+        with gemini_client_lock:
+            client = app.extensions.get('gemini_client')
+            if client is None or client.api_key != api_key:
+                if client is not None:
+                    client.shutdown()
+                client = GeminiClient(
+                    load_genai(), api_key, app.config['GEMINI_MODEL'],
+                    timeout=app.config['AI_TIMEOUT'],
+                    max_workers=app.config['AI_MAX_WORKERS'],
+                    max_pending=app.config['AI_MAX_PENDING'],
+                    breaker=CircuitBreaker(app.config['AI_BREAKER_THRESHOLD'], app.config['AI_BREAKER_RESET']),
+                )
+                app.extensions['gemini_client'] = client
+            return client
+
+    def gemini_generation_config():
+        return load_genai().types.GenerationConfig(
+            temperature=0.5,
+            top_p=0.95,
+            max_output_tokens=512,
+        )
+
+    def build_chat_prompt(user_message, role, profile_text):
         # Tạo system prompt cho Gemini - đơn giản hóa để tránh recitation filter
         system_prompt = (
             "Bạn là trợ lý học tập bằng tiếng Việt cho {role}. "
@@ -421,38 +609,26 @@ def create_app() -> Flask:
             system_prompt += "\n\nThông tin người dùng:\n" + profile_text
 
         # Tạo prompt đầy đủ - tránh format phức tạp
-        full_prompt = f"{system_prompt}\n\nCâu hỏi: {user_message}\n\nTrả lời:"
+        return f"{system_prompt}\n\nCâu hỏi: {user_message}\n\nTrả lời:"
+
+    def generate_gemini_response(api_key, user_message, role, profile_text):
+        full_prompt = build_chat_prompt(user_message, role, profile_text)
+        client = get_gemini_client(api_key)
+        model_name = client.model_name
 
         try:
-            model = genai.GenerativeModel(model_name)
-            
-            # Thử không dùng safety_settings trước (để tránh recitation filter)
-            try:
-                response = model.generate_content(
-                    full_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.5,
-                        top_p=0.95,
-                        max_output_tokens=512,
-                    )
-                )
-            except Exception as safety_exc:
-                # Nếu lỗi do thiếu safety_settings, thử lại với settings tối thiểu
-                app.logger.debug(f'Thử lại với safety settings cho {model_name}')
-                response = model.generate_content(
-                    full_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.5,
-                        top_p=0.95,
-                        max_output_tokens=512,
-                    ),
-                    safety_settings=[
-                        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-                    ]
-                )
+            # Thử không dùng safety_settings trước (để tránh recitation filter);
+            # nếu lỗi thì thử lại một lần với settings tối thiểu, trong cùng deadline
+            response = client.generate(
+                full_prompt,
+                generation_config=gemini_generation_config(),
+                retry_kwargs={'safety_settings': [
+                    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+                    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+                    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+                    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+                ]},
+            )
             
             # Kiểm tra finish_reason trước khi truy cập response.text
             if not response or not response.candidates:
@@ -493,36 +669,29 @@ def create_app() -> Flask:
         role = 'teacher' if user.is_teacher() else 'student'
         profile = get_teacher_overview_profile(user) if role == 'teacher' else get_student_learning_profile(user)
 
-        ai_text, error = call_external_ai_model(user_message, role, profile)
+        ai_text, error, cache_status = call_external_ai_model(user_message, role, profile)
         if ai_text:
-            return ai_text, False
+            return ai_text, False, cache_status
 
         fallback_text = generate_rule_based_response(user_message, role, profile)
         if error:
             app.logger.info('Sử dụng phản hồi fallback cho AI chat: %s', error)
-        return fallback_text, True
+        return fallback_text, True, cache_status
 
     @app.route('/')
     @login_required
     def index():
+        counts = dashboard_counters.get()
         # Auto-create sample data if database is empty
-        if User.query.count() == 0:
+        if counts['users'] == 0:
             create_sample_data()
+            counts = dashboard_counters.get()
         
-        total_users = User.query.count()
-        total_students = User.query.filter_by(role='student').count()
-        total_courses = Course.query.count()
-        total_enrollments = Enrollment.query.count()
-        sales_summary = None
-        try:
-            sales_summary = load_sales_data_summary('DuLieu_BanHang.xlsx')
-        except Exception:
-            sales_summary = None
         return render_template('index.html',
-                               total_users=total_students,  # Chỉ đếm sinh viên
-                               total_courses=total_courses,
-                               total_enrollments=total_enrollments,
-                               sales_summary=sales_summary,
+                               total_users=counts['students'],  # Chỉ đếm sinh viên
+                               total_courses=counts['courses'],
+                               total_enrollments=counts['enrollments'],
+                               sales_summary=sales_summary_cache.get(),
                                current_month=datetime.now().strftime('%m'))
 
     @app.route('/login', methods=['GET', 'POST'])
@@ -536,9 +705,10 @@ def create_app() -> Flask:
                 login_user(user, remember=form.remember_me.data)
                 # Log login action
                 try:
-                    log = Log(user_id=user.id, action='login')
-                    db.session.add(log)
+                    # A dropped login has no Log row, so it is not counted either
+                    record_login(user.id, lambda: activity_log.emit(user.id, 'login') != LOG_DROPPED)
                     db.session.commit()
+                    profile_snapshots.invalidate(user.id)
                 except Exception:
                     pass  # Ignore log errors
                 
@@ -576,37 +746,45 @@ def create_app() -> Flask:
         if current_user.is_teacher():
             # Teacher sees own courses + option to view all
             my_courses = Course.query.filter_by(teacher_id=current_user.id).all()
-            all_courses = Course.query.all()
+            all_courses = Course.query.options(joinedload(Course.teacher)).all()
+            student_counts, assignment_counts = course_counts()
             return render_template('courses.html', 
                                  my_courses=my_courses, 
                                  all_courses=all_courses,
+                                 student_counts=student_counts,
+                                 assignment_counts=assignment_counts,
                                  is_teacher=True)
         else:
             # For students, show enrolled courses and available courses
-            enrollments = Enrollment.query.filter_by(user_id=current_user.id).all()
+            enrollments = Enrollment.query.filter_by(user_id=current_user.id) \
+                .options(joinedload(Enrollment.course).joinedload(Course.teacher)).all()
             enrolled_course_ids = [e.course_id for e in enrollments]
             enrolled_courses = [e.course for e in enrollments]
-            available_courses = Course.query.filter(~Course.id.in_(enrolled_course_ids)).all()
+            available_courses = Course.query.options(joinedload(Course.teacher)) \
+                .filter(~Course.id.in_(enrolled_course_ids)).all()
+            student_counts, assignment_counts = course_counts()
             
             return render_template('courses.html', 
                                  enrolled_courses=enrolled_courses,
                                  available_courses=available_courses,
+                                 student_counts=student_counts,
+                                 assignment_counts=assignment_counts,
                                  is_teacher=False)
 
     @app.route('/search')
     @login_required
     def search():
-        """Global search for users and courses."""
+        """Global search for users, courses and assignments."""
         q = request.args.get('q', '').strip()
         if not q:
             flash('Vui lòng nhập từ khóa tìm kiếm.', 'warning')
             return redirect(request.referrer or url_for('index'))
 
-        # Case-insensitive search
-        users = User.query.filter(User.username.ilike(f"%{q}%")).all()
-        courses = Course.query.filter(Course.name.ilike(f"%{q}%")).all()
+        # FTS5 (xếp hạng, khớp tiền tố) nếu có, nếu không thì LIKE
+        results = search_index_lookup(q, limit=app.config['SEARCH_RESULT_LIMIT'])
 
-        return render_template('search_results.html', query=q, users=users, courses=courses)
+        return render_template('search_results.html', query=q, users=results['users'],
+                               courses=results['courses'], assignments=results['assignments'])
 
     @app.route('/courses/add', methods=['GET', 'POST'])
     @login_required
@@ -645,7 +823,10 @@ def create_app() -> Flask:
         else:
             enrollment = Enrollment(user_id=current_user.id, course_id=course_id)
             db.session.add(enrollment)
+            record_enrollment(current_user.id, 1)
             db.session.commit()
+            course = db.session.get(Course, course_id)
+            profile_snapshots.invalidate(current_user.id, course.teacher_id if course else None)
             flash('Đăng ký khóa học thành công!', 'success')
         
         return redirect(url_for('courses'))
@@ -662,52 +843,64 @@ def create_app() -> Flask:
         
         if form.validate_on_submit():
             # Handle optional file upload
-            file_path = None
+            file_path = file_name = None
             try:
                 uploaded = getattr(form, 'file', None)
                 if uploaded and uploaded.data:
                     f = uploaded.data
-                    raw_filename = secure_filename(f.filename)
-                    unique_prefix = f"{current_user.id}_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8]}_"
-                    filename = unique_prefix + raw_filename
-                    save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    f.save(save_path)
-                    file_path = save_path
+                    file_path = upload_store.put(f)
+                    file_name = secure_filename(f.filename) or None
             except Exception:
                 # If upload fails, continue but don't block submission
-                file_path = None
+                file_path = file_name = None
 
             # Students should not set the score; teacher will grade later.
-            submission = Submission(assignment_id=assignment_id, student_id=current_user.id, score=None, file_path=file_path)
+            submission = Submission(assignment_id=assignment_id, student_id=current_user.id, score=None,
+                                    file_path=file_path, file_name=file_name)
             db.session.add(submission)
             
             # Log submission action
-            log = Log(user_id=current_user.id, course_id=assignment.course_id, action='submit_assignment')
-            db.session.add(log)
+            activity_log.emit(current_user.id, 'submit_assignment', course_id=assignment.course_id)
+            record_submission(current_user.id)
             db.session.commit()
+            profile_snapshots.invalidate(current_user.id, assignment.course.teacher_id)
             
             flash('Nộp bài thành công!', 'success')
             return redirect(url_for('course_detail', course_id=assignment.course_id))
         
         return render_template('submit_assignment.html', form=form, assignment=assignment)
 
+    @app.route('/submissions/<int:submission_id>/file')
+    @login_required
+    def download_submission(submission_id):
+        """Tải tệp bài nộp: sinh viên nộp bài hoặc giảng viên"""
+        submission = Submission.query.get_or_404(submission_id)
+        if not (current_user.is_teacher() or submission.student_id == current_user.id):
+            abort(403)
+        if not submission.file_path:
+            abort(404)
+        download_name = submission.file_name or os.path.basename(submission.file_path)
+        try:
+            return send_upload(upload_store, submission.file_path, download_name,
+                               accel_prefix=app.config['UPLOAD_ACCEL_PREFIX'])
+        except FileNotFoundError:
+            abort(404)
+
     @app.route('/profile')
     @login_required
     def profile():
         # Get user statistics
-        user_submissions = Submission.query.filter_by(student_id=current_user.id).all()
-        user_enrollments = Enrollment.query.filter_by(user_id=current_user.id).all()
-        user_logs = Log.query.filter_by(user_id=current_user.id).all()
+        stats = get_student_stats(current_user.id)
         
-        avg_score = sum(sub.score for sub in user_submissions if sub.score) / len(user_submissions) if user_submissions else 0
-        login_count = len([log for log in user_logs if log.action == 'login'])
+        # Điểm trung bình tính trên tất cả bài nộp (bài chưa chấm tính là 0)
+        avg_score = stats.score_sum / stats.submission_count if stats.submission_count else 0
         
         return render_template('profile.html', 
                                user=current_user,
                                avg_score=avg_score,
-                               login_count=login_count,
-                               submissions_count=len(user_submissions),
-                               enrollments_count=len(user_enrollments))
+                               login_count=stats.login_count,
+                               submissions_count=stats.submission_count,
+                               enrollments_count=stats.courses_enrolled)
 
     @app.route('/settings')
     @login_required
@@ -716,6 +909,7 @@ def create_app() -> Flask:
 
     @app.route('/ai-support')
     @login_required
+    @read_replica
     def ai_support():
         """AI Hỗ trợ học tập - khác nhau giữa teacher và student"""
         if current_user.is_teacher():
@@ -723,15 +917,15 @@ def create_app() -> Flask:
             risk = request.args.get('risk', 'all')
             # Giảng viên: Xem tất cả sinh viên và gợi ý quản lý lớp
             students = User.query.filter_by(role='student').all()
+            all_stats = load_student_stats(student.id for student in students)
             student_analytics = []
 
             for student in students:
-                submissions = Submission.query.filter_by(student_id=student.id).all()
-                scores = [s.score for s in submissions if s.score is not None]
-                avg_score = sum(scores) / len(scores) if scores else 0
+                stats = all_stats[student.id]
+                avg_score = stats.avg_score if stats.avg_score is not None else 0
 
-                login_count = Log.query.filter_by(user_id=student.id, action='login').count()
-                assignments_completed = len(scores)
+                login_count = stats.login_count
+                assignments_completed = stats.graded_count
 
                 # AI gợi ý cho giảng viên và xác định mức rủi ro
                 if avg_score < 5:
@@ -775,13 +969,12 @@ def create_app() -> Flask:
         
         else:
             # Sinh viên: Xem dữ liệu cá nhân và gợi ý học tập
-            submissions = Submission.query.filter_by(student_id=current_user.id).all()
-            scores = [s.score for s in submissions if s.score is not None]
-            avg_score = sum(scores) / len(scores) if scores else 0
+            stats = get_student_stats(current_user.id)
+            avg_score = stats.avg_score if stats.avg_score is not None else 0
             
-            login_count = Log.query.filter_by(user_id=current_user.id, action='login').count()
-            assignments_completed = len(scores)
-            courses_enrolled = Enrollment.query.filter_by(user_id=current_user.id).count()
+            login_count = stats.login_count
+            assignments_completed = stats.graded_count
+            courses_enrolled = stats.courses_enrolled
             
             # AI gợi ý cho sinh viên
             if avg_score < 5:
@@ -842,21 +1035,81 @@ def create_app() -> Flask:
         if not user_message:
             return jsonify({'error': 'Thiếu nội dung câu hỏi.'}), 400
 
-        response_text, used_fallback = generate_ai_chat_response(user_message, current_user)
+        response_text, used_fallback, cache_status = generate_ai_chat_response(user_message, current_user)
 
         if not response_text:
             return jsonify({
                 'response': 'Xin lỗi, hiện tại trợ lý AI chưa thể phản hồi. Vui lòng thử lại sau.',
-                'meta': {'usedFallback': True, 'model': 'rule-based'}
+                'meta': {'usedFallback': True, 'model': 'rule-based', 'cache': cache_status}
             }), 500
 
         meta = {
             'usedFallback': used_fallback,
-            'model': 'rule-based' if used_fallback else os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash')
+            'model': 'rule-based' if used_fallback else app.config['GEMINI_MODEL'],
+            'cache': cache_status
         }
 
         return jsonify({'response': response_text, 'meta': meta}), 200
 
+    def stream_ai_chat_events(user_message, role, profile):
+        """Sinh các sự kiện SSE: 'delta' cho từng đoạn văn bản, 'done' kèm meta ở cuối."""
+        def event(name, payload):
+            return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        profile_text = format_profile_for_prompt(profile)
+        api_key = os.environ.get('GEMINI_API_KEY')
+        cache_status = 'bypass'
+
+        if api_key and load_genai() is not None:
+            key = make_cache_key(user_message, role, profile_text)
+            found, cached = ai_response_cache.get(key)
+            if found:
+                yield event('delta', {'text': cached[0]})
+                yield event('done', {'meta': {'usedFallback': False, 'model': app.config['GEMINI_MODEL'], 'cache': 'hit'}})
+                return
+
+            cache_status = 'miss'
+            client = get_gemini_client(api_key)
+            pieces = []
+            try:
+                for piece in client.stream(build_chat_prompt(user_message, role, profile_text),
+                                           generation_config=gemini_generation_config()):
+                    pieces.append(piece)
+                    yield event('delta', {'text': piece})
+            except Exception as exc:
+                app.logger.warning('Lỗi khi stream từ Gemini: %s', exc)
+                if pieces:
+                    # Đã gửi một phần câu trả lời: không trộn thêm phản hồi fallback
+                    yield event('error', {'error': 'Phản hồi bị gián đoạn. Vui lòng thử lại.'})
+                    yield event('done', {'meta': {'usedFallback': False, 'model': client.model_name, 'cache': cache_status, 'partial': True}})
+                    return
+            else:
+                if pieces:
+                    ai_response_cache.set(key, (''.join(pieces).strip(), None))
+                    yield event('done', {'meta': {'usedFallback': False, 'model': client.model_name, 'cache': cache_status}})
+                    return
+
+        # SDK/API key không có, breaker đang mở hoặc upstream lỗi: dùng phản hồi rule-based
+        yield event('delta', {'text': generate_rule_based_response(user_message, role, profile)})
+        yield event('done', {'meta': {'usedFallback': True, 'model': 'rule-based', 'cache': cache_status}})
+
+    @app.route('/api/ai/chat/stream', methods=['GET', 'POST'])
+    @login_required
+    def ai_chat_stream_api():
+        """Phiên bản streaming (Server-Sent Events) của /api/ai/chat"""
+        data = request.get_json(silent=True) or {}
+        user_message = (data.get('message') or request.args.get('message') or '').strip()
+
+        if not user_message:
+            return jsonify({'error': 'Thiếu nội dung câu hỏi.'}), 400
+
+        role = 'teacher' if current_user.is_teacher() else 'student'
+        profile = get_teacher_overview_profile(current_user) if role == 'teacher' else get_student_learning_profile(current_user)
+
+        return Response(stream_with_context(stream_ai_chat_events(user_message, role, profile)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
     @app.route('/teacher/student/<int:student_id>')
     @login_required
     def teacher_view_student(student_id):
@@ -871,13 +1124,12 @@ def create_app() -> Flask:
             return redirect(url_for('ai_support'))
         
         # Tính toán metrics cho sinh viên cụ thể
-        submissions = Submission.query.filter_by(student_id=student.id).all()
-        scores = [s.score for s in submissions if s.score is not None]
-        avg_score = sum(scores) / len(scores) if scores else 0
+        stats = get_student_stats(student.id)
+        avg_score = stats.avg_score if stats.avg_score is not None else 0
         
-        login_count = Log.query.filter_by(user_id=student.id, action='login').count()
-        assignments_completed = len(scores)
-        courses_enrolled = Enrollment.query.filter_by(user_id=student.id).count()
+        login_count = stats.login_count
+        assignments_completed = stats.graded_count
+        courses_enrolled = stats.courses_enrolled
         
         # AI gợi ý cho giảng viên về sinh viên này
         if avg_score < 5:
@@ -924,85 +1176,37 @@ def create_app() -> Flask:
 
     @app.route('/analytics')
     @login_required
+    @read_replica
     def analytics():
         """Trang phân tích với dữ liệu thực từ database"""
-        import pandas as pd
-        from collections import Counter
-        
         if current_user.is_teacher():
-            # Teacher xem analytics toàn hệ thống
-            all_students = User.query.filter_by(role='student').all()
-            all_submissions = Submission.query.all()
-            all_logs = Log.query.all()
-            all_courses = Course.query.all()
-            
-            # Tính toán metrics
-            total_views = Log.query.filter_by(action='view_material').count()
-            total_logins = Log.query.filter_by(action='login').count()
-            
-            # Điểm trung bình hệ thống
-            scores = [s.score for s in all_submissions if s.score]
-            avg_score = sum(scores) / len(scores) if scores else 0
-            
-            # Tỷ lệ hoàn thành (số submission / tổng assignments có thể nộp)
-            total_possible_submissions = 0
-            for student in all_students:
-                enrollments = Enrollment.query.filter_by(user_id=student.id).all()
-                for enrollment in enrollments:
-                    course_assignments = Assignment.query.filter_by(course_id=enrollment.course_id).count()
-                    total_possible_submissions += course_assignments
-            
-            completion_rate = (len(all_submissions) / total_possible_submissions * 100) if total_possible_submissions > 0 else 0
-            
-            # Phân bố điểm
-            score_distribution = {
-                'excellent': len([s for s in scores if s >= 9]),
-                'good': len([s for s in scores if 7 <= s < 9]),
-                'average': len([s for s in scores if 5 <= s < 7]),
-                'poor': len([s for s in scores if s < 5])
-            }
-            
-            # Khóa học phổ biến
-            enrollments_per_course = {}
-            for course in all_courses:
-                count = Enrollment.query.filter_by(course_id=course.id).count()
-                enrollments_per_course[course.name] = count
-            
-            # Top 5 courses
-            top_courses = dict(sorted(enrollments_per_course.items(), key=lambda x: x[1], reverse=True)[:5]) if enrollments_per_course else {}
-            
-            # Xu hướng theo tháng (6 tháng gần nhất)
-            import datetime as dt
-            monthly_data = {}
-            for i in range(6):
-                month = (dt.datetime.now() - dt.timedelta(days=30*i)).strftime('%m/%Y')
-                monthly_data[month] = {
-                    'views': random.randint(1000, 5000),
-                    'submissions': random.randint(500, 2000)
-                }
+            # Teacher xem analytics toàn hệ thống (số câu truy vấn cố định)
+            summary = teacher_analytics_summary()
             
             return render_template('analytics.html',
                                  role='teacher',
-                                 total_views=total_views,
-                                 total_logins=total_logins,
-                                 avg_score=round(avg_score, 1),
-                                 completion_rate=round(completion_rate, 1),
-                                 score_distribution=score_distribution,
-                                 top_courses=top_courses,
-                                 monthly_data=monthly_data,
-                                 total_students=len(all_students),
-                                 total_submissions=len(all_submissions))
+                                 total_views=summary['total_views'],
+                                 total_logins=summary['total_logins'],
+                                 avg_score=round(summary['avg_score'], 1),
+                                 completion_rate=round(summary['completion_rate'], 1),
+                                 score_distribution=summary['score_distribution'],
+                                 top_courses=summary['top_courses'],
+                                 monthly_data_url=url_for('api_analytics_monthly'),
+                                 total_students=summary['total_students'],
+                                 total_submissions=summary['total_submissions'])
         else:
             # Student xem analytics cá nhân
-            submissions = Submission.query.filter_by(student_id=current_user.id).all()
-            logs = Log.query.filter_by(user_id=current_user.id).all()
-            enrollments = Enrollment.query.filter_by(user_id=current_user.id).all()
+            submissions = Submission.query.filter_by(student_id=current_user.id) \
+                .options(joinedload(Submission.assignment)).all()
+            enrollments = Enrollment.query.filter_by(user_id=current_user.id) \
+                .options(joinedload(Enrollment.course)).all()
             
             scores = [s.score for s in submissions if s.score]
             avg_score = sum(scores) / len(scores) if scores else 0
             
-            login_count = len([log for log in logs if log.action == 'login'])
-            view_count = len([log for log in logs if log.action == 'view_material'])
+            action_totals = action_counts(user_id=current_user.id)
+            login_count = action_totals.get('login', 0)
+            view_count = action_totals.get('view_material', 0)
             
             # Điểm theo khóa học
             course_scores = {}
@@ -1069,20 +1273,17 @@ def create_app() -> Flask:
         user = User.query.get_or_404(user_id)
         
         # Get user statistics
-        submissions = Submission.query.filter_by(student_id=user.id).all()
+        stats = get_student_stats(user.id)
         enrollments = Enrollment.query.filter_by(user_id=user.id).all()
-        logs = Log.query.filter_by(user_id=user.id).all()
         
-        scores = [s.score for s in submissions if s.score is not None]
-        avg_score = sum(scores) / len(scores) if scores else 0
-        login_count = len([log for log in logs if log.action == 'login'])
+        avg_score = stats.avg_score if stats.avg_score is not None else 0
         
         return render_template('view_user.html',
                              viewed_user=user,
                              avg_score=round(avg_score, 1),
-                             submissions_count=len(submissions),
+                             submissions_count=stats.submission_count,
                              enrollments=enrollments,
-                             login_count=login_count)
+                             login_count=stats.login_count)
     
     @app.route('/users/<int:user_id>/edit', methods=['GET', 'POST'])
     @login_required
@@ -1109,6 +1310,7 @@ def create_app() -> Flask:
                     user.set_password(password)
                 
                 db.session.commit()
+                user_cache.invalidate(user.id)
                 flash(f'Đã cập nhật thông tin người dùng {user.username}!', 'success')
                 return redirect(url_for('users'))
         
@@ -1129,41 +1331,62 @@ def create_app() -> Flask:
             return redirect(url_for('users'))
         
         username = user.username
+        StudentStats.query.filter_by(user_id=user.id).delete()
         db.session.delete(user)
         db.session.commit()
+        user_cache.invalidate(user_id)
+        profile_snapshots.clear()
         flash(f'Đã xóa người dùng {username}!', 'success')
         return redirect(url_for('users'))
 
+    def gradebook_args():
+        """Đọc tham số lọc/sắp xếp/phân trang của bảng điểm từ query string"""
+        sort = request.args.get('sort', 'id')
+        if sort not in GRADEBOOK_SORTS:
+            sort = 'id'
+        limit = request.args.get('limit', app.config['GRADEBOOK_PAGE_SIZE'], type=int)
+        return {
+            'course_id': request.args.get('course_id', type=int),
+            'sort': sort,
+            'descending': request.args.get('order') == 'desc',
+            'cursor': request.args.get('cursor') or None,
+            'limit': max(1, min(limit, API_STATS_MAX_LIMIT)),
+        }
+
+    def gradebook_item(row):
+        return {
+            'student': row,
+            'avg_score': round(row.avg_score, 1) if row.avg_score is not None else 0,
+            'submissions_count': row.submissions_count,
+            'courses_count': row.courses_count,
+        }
+
     @app.route('/grades')
     @login_required
+    @read_replica
     def grades():
         """Trang xem điểm - phân quyền theo role"""
         if current_user.is_teacher():
-            # Teacher xem tất cả điểm của tất cả sinh viên
-            students = User.query.filter_by(role='student').all()
-            student_grades = []
-            
-            for student in students:
-                submissions = Submission.query.filter_by(student_id=student.id).all()
-                enrollments = Enrollment.query.filter_by(user_id=student.id).all()
-                
-                scores = [s.score for s in submissions if s.score is not None]
-                avg_score = sum(scores) / len(scores) if scores else 0
-                
-                student_grades.append({
-                    'student': student,
-                    'avg_score': round(avg_score, 1),
-                    'submissions_count': len(submissions),
-                    'courses_count': len(enrollments)
-                })
+            # Teacher xem bảng điểm sinh viên theo trang (một câu truy vấn mỗi trang)
+            args = gradebook_args()
+            rows, next_cursor = gradebook_page(**args)
+            student_grades = [gradebook_item(row) for row in rows]
             
             return render_template('grades.html',
                                  role='teacher',
-                                 student_grades=student_grades)
+                                 student_grades=student_grades,
+                                 courses=Course.query.order_by(Course.name).all(),
+                                 course_id=args['course_id'],
+                                 sort=args['sort'],
+                                 descending=args['descending'],
+                                 cursor=args['cursor'],
+                                 next_cursor=next_cursor)
         else:
             # Student chỉ xem điểm của mình
-            submissions = Submission.query.filter_by(student_id=current_user.id).all()
-            enrollments = Enrollment.query.filter_by(user_id=current_user.id).all()
+            submissions = Submission.query.filter_by(student_id=current_user.id) \
+                .options(joinedload(Submission.assignment)).all()
+            enrollments = Enrollment.query.filter_by(user_id=current_user.id) \
+                .options(joinedload(Enrollment.course)).all()
             
             # Group submissions by course
             courses_with_grades = []
@@ -1198,12 +1421,70 @@ def create_app() -> Flask:
         if score is None or score < 0 or score > 10:
             flash('Điểm phải từ 0 đến 10!', 'danger')
         else:
+            old_score = submission.score
             submission.score = round(score, 1)
+            record_grade(submission.student_id, old_score, submission.score)
             db.session.commit()
+            profile_snapshots.invalidate(submission.student_id, submission.assignment.course.teacher_id)
             flash(f'Đã chấm điểm {score} cho bài nộp!', 'success')
         
         return redirect(request.referrer or url_for('grades'))
     
+    def bulk_request(key, bare=None):
+        """(rows, options) từ tệp CSV tải lên (trường ``file``, tùy chọn trong form) hoặc JSON
+        (danh sách, hoặc ``{key: [...], <tùy chọn>}``); ``bare`` như trong ``json_rows``"""
+        upload = request.files.get('file')
+        if upload and upload.filename:
+            return read_csv_rows(upload.stream), request.form
+        payload = request.get_json(silent=True)
+        options = {}
+        if isinstance(payload, dict):
+            options, payload = payload, payload.get(key)
+        return json_rows(payload, bare=bare), options
+
+    def bulk_flag(value):
+        return value in (True, 1) or str(value).lower() in ('1', 'true', 'on', 'yes')
+
+    @app.route('/api/grades/bulk', methods=['POST'])
+    @login_required
+    def api_grades_bulk():
+        """Chấm điểm hàng loạt: JSON hoặc CSV (submission_id hoặc student_id/username + assignment_id, score)"""
+        if not current_user.is_teacher():
+            return jsonify({'error': 'Chỉ giảng viên mới có thể chấm điểm.'}), 403
+        try:
+            rows, options = bulk_request('grades')
+        except (ValueError, UnicodeDecodeError) as exc:
+            return jsonify({'error': f'Dữ liệu không hợp lệ: {exc}'}), 400
+        result = apply_grades(rows, dry_run=bulk_flag(options.get('dry_run')))
+        if result['updated'] and not result['dry_run']:
+            profile_snapshots.clear()
+        return jsonify(result)
+
+    @app.route('/grades/import', methods=['POST'])
+    @login_required
+    def import_grades():
+        """Teacher nhập bảng điểm từ tệp CSV"""
+        if not current_user.is_teacher():
+            flash('Chỉ giảng viên mới có thể chấm điểm.', 'danger')
+            return redirect(url_for('index'))
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Vui lòng chọn tệp CSV!', 'danger')
+            return redirect(url_for('grades'))
+        try:
+            result = apply_grades(read_csv_rows(upload.stream))
+        except (ValueError, UnicodeDecodeError):
+            flash('Không đọc được tệp CSV (cần mã hóa UTF-8).', 'danger')
+            return redirect(url_for('grades'))
+        if result['updated']:
+            profile_snapshots.clear()
+            flash(f"Đã chấm điểm {result['updated']} bài nộp!", 'success')
+        for error in result['errors'][:10]:
+            flash(f"Dòng {error['row']}: {error['error']}", 'warning')
+        if len(result['errors']) > 10:
+            flash(f"... và {len(result['errors']) - 10} dòng lỗi khác.", 'warning')
+        return redirect(url_for('grades'))
+
     @app.route('/courses/<int:course_id>/edit', methods=['GET', 'POST'])
     @login_required
     def edit_course(course_id):
@@ -1223,6 +1504,7 @@ def create_app() -> Flask:
             course.name = request.form.get('name')
             course.description = request.form.get('description')
             db.session.commit()
+            profile_snapshots.invalidate(course.teacher_id)
             flash(f'Đã cập nhật khóa học {course.name}!', 'success')
             return redirect(url_for('course_detail', course_id=course.id))
         
@@ -1244,8 +1526,11 @@ def create_app() -> Flask:
             return redirect(url_for('courses'))
         
         course_name = course.name
+        # Activity logs outlive the course: detach them, or the course.id foreign key rejects the delete
+        Log.query.filter_by(course_id=course.id).update({Log.course_id: None}, synchronize_session=False)
         db.session.delete(course)
         db.session.commit()
+        profile_snapshots.clear()
         flash(f'Đã xóa khóa học {course_name}!', 'success')
         return redirect(url_for('courses'))
     
@@ -1258,7 +1543,7 @@ def create_app() -> Flask:
             return redirect(url_for('courses'))
         
         course = Course.query.get_or_404(course_id)
-        enrollments = Enrollment.query.filter_by(course_id=course_id).all()
+        enrollments = Enrollment.query.filter_by(course_id=course_id).options(joinedload(Enrollment.user)).all()
         
         # Get all students not in this course
         enrolled_student_ids = [e.user_id for e in enrollments]
@@ -1267,22 +1552,17 @@ def create_app() -> Flask:
             ~User.id.in_(enrolled_student_ids)
         ).all()
         
-        # Get student stats
+        # Get student stats (one grouped query for the whole course)
+        submission_stats = course_submission_stats(course_id)
         student_stats = []
         for enrollment in enrollments:
             student = enrollment.user
-            submissions = Submission.query.join(Assignment).filter(
-                Assignment.course_id == course_id,
-                Submission.student_id == student.id
-            ).all()
-            
-            scores = [s.score for s in submissions if s.score is not None]
-            avg_score = sum(scores) / len(scores) if scores else 0
+            submissions_count, avg_score = submission_stats.get(student.id, (0, 0))
             
             student_stats.append({
                 'student': student,
                 'avg_score': round(avg_score, 1),
-                'submissions_count': len(submissions)
+                'submissions_count': submissions_count
             })
         
         return render_template('course_students.html',
@@ -1316,11 +1596,66 @@ def create_app() -> Flask:
         else:
             enrollment = Enrollment(user_id=student_id, course_id=course_id)
             db.session.add(enrollment)
+            record_enrollment(student_id, 1)
             db.session.commit()
+            profile_snapshots.invalidate(student_id, course.teacher_id)
             flash('Đã thêm sinh viên vào khóa học!', 'success')
         
         return redirect(url_for('course_students', course_id=course_id))
     
+    @app.route('/api/enrollments/bulk', methods=['POST'])
+    @login_required
+    def api_enrollments_bulk():
+        """Ghi danh/hủy ghi danh hàng loạt: JSON ``{action, course_id, students: [...]}`` hoặc CSV
+        (student_id hoặc username, course_id tùy chọn). Mỗi phần tử của ``students`` là một
+        đối tượng ``{student_id | username, course_id}``, hoặc chỉ id (số) hay username (chuỗi)"""
+        if not current_user.is_teacher():
+            return jsonify({'error': 'Chỉ giảng viên mới có thể quản lý sinh viên.'}), 403
+        try:
+            rows, options = bulk_request('students', bare=student_ref)
+            course_id = int(options['course_id']) if options.get('course_id') not in (None, '') else None
+        except (ValueError, TypeError, UnicodeDecodeError) as exc:
+            return jsonify({'error': f'Dữ liệu không hợp lệ: {exc}'}), 400
+        action = options.get('action', 'enroll')
+        if action not in ('enroll', 'unenroll'):
+            return jsonify({'error': "action phải là 'enroll' hoặc 'unenroll'."}), 400
+        result = apply_enrollments(rows, course_id=course_id, unenroll=action == 'unenroll',
+                                   dry_run=bulk_flag(options.get('dry_run')))
+        if (result['added'] or result['removed']) and not result['dry_run']:
+            profile_snapshots.clear()
+        return jsonify(result)
+
+    @app.route('/courses/<int:course_id>/students/import', methods=['POST'])
+    @login_required
+    def import_course_students(course_id):
+        """Teacher thêm/xóa nhiều sinh viên của khóa học từ tệp CSV"""
+        if not current_user.is_teacher():
+            flash('Chỉ giảng viên mới có thể thêm sinh viên.', 'danger')
+            return redirect(url_for('courses'))
+        Course.query.get_or_404(course_id)
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Vui lòng chọn tệp CSV!', 'danger')
+            return redirect(url_for('course_students', course_id=course_id))
+        unenroll = request.form.get('action') == 'unenroll'
+        try:
+            result = apply_enrollments(read_csv_rows(upload.stream), course_id=course_id, unenroll=unenroll)
+        except (ValueError, UnicodeDecodeError):
+            flash('Không đọc được tệp CSV (cần mã hóa UTF-8).', 'danger')
+            return redirect(url_for('course_students', course_id=course_id))
+        if result['added'] or result['removed']:
+            profile_snapshots.clear()
+        if unenroll:
+            flash(f"Đã xóa {result['removed']} sinh viên, bỏ qua {result['skipped']}.", 'success')
+        else:
+            flash(f"Đã thêm {result['added']} sinh viên, bỏ qua {result['skipped']} (đã có trong khóa học).", 'success')
+        if result['unknown']:
+            shown = ', '.join(str(student) for student in result['unknown_students'][:10])
+            flash(f"{result['unknown']} sinh viên không tồn tại: {shown}", 'warning')
+        for error in result['errors'][:10]:
+            flash(f"Dòng {error['row']}: {error['error']}", 'warning')
+        return redirect(url_for('course_students', course_id=course_id))
+
     @app.route('/courses/<int:course_id>/students/<int:student_id>/remove', methods=['POST'])
     @login_required
     def remove_student_from_course(course_id, student_id):
@@ -1335,7 +1670,10 @@ def create_app() -> Flask:
         ).first_or_404()
         
         db.session.delete(enrollment)
+        record_enrollment(student_id, -1)
         db.session.commit()
+        course = db.session.get(Course, course_id)
+        profile_snapshots.invalidate(student_id, course.teacher_id if course else None)
         flash('Đã xóa sinh viên khỏi khóa học!', 'success')
         return redirect(url_for('course_students', course_id=course_id))
     
@@ -1367,6 +1705,7 @@ def create_app() -> Flask:
                     return redirect(url_for('edit_assignment', assignment_id=assignment_id))
             
             db.session.commit()
+            profile_snapshots.invalidate(course.teacher_id)
             flash(f'Đã cập nhật bài tập {assignment.title}!', 'success')
             return redirect(url_for('course_detail', course_id=course.id))
         
@@ -1392,6 +1731,8 @@ def create_app() -> Flask:
         title = assignment.title
         db.session.delete(assignment)
         db.session.commit()
+        # Bài nộp của sinh viên thuộc bài tập này cũng ảnh hưởng tới profile của họ
+        profile_snapshots.clear()
         flash(f'Đã xóa bài tập {title}!', 'success')
         return redirect(url_for('course_detail', course_id=course_id))
     
@@ -1428,6 +1769,7 @@ def create_app() -> Flask:
                 
                 db.session.add(assignment)
                 db.session.commit()
+                profile_snapshots.invalidate(course.teacher_id)
                 flash(f'Đã thêm bài tập {title}!', 'success')
                 return redirect(url_for('course_detail', course_id=course_id))
         
@@ -1435,94 +1777,78 @@ def create_app() -> Flask:
 
     @app.route('/api/stats')
     @login_required
+    @read_replica
     def api_stats():
         # Learning Analytics với pandas
+        import numpy as np
         import pandas as pd
         
-        # Get user data
-        users = User.query.all()
-        courses = Course.query.all()
-        enrollments = Enrollment.query.all()
-        submissions = Submission.query.all()
-        logs = Log.query.all()
-        
-        # Convert to DataFrame for analysis
-        user_data = []
-        for user in users:
-            user_logs = [log for log in logs if log.user_id == user.id]
-            user_submissions = [sub for sub in submissions if sub.student_id == user.id]
-            user_enrollments = [enroll for enroll in enrollments if enroll.user_id == user.id]
-            
-            avg_score = sum(sub.score for sub in user_submissions if sub.score) / len(user_submissions) if user_submissions else 0
-            login_count = len([log for log in user_logs if log.action == 'login'])
-            
-            user_data.append({
-                'user_id': user.id,
-                'username': user.username,
-                'role': user.role,
-                'login_count': login_count,
-                'avg_score': avg_score,
-                'courses_enrolled': len(user_enrollments),
-                'assignments_submitted': len(user_submissions)
-            })
-        
-        df = pd.DataFrame(user_data)
+        # Optional filters: ?role=student|teacher, ?limit=N&cursor=<last user id>
+        role = request.args.get('role') or None
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, API_STATS_MAX_LIMIT))
+        
+        # One grouped query instead of scanning every log/submission per user
+        rows = user_activity_rows(role=role, after_id=cursor, limit=limit)
+        df = pd.DataFrame(rows, columns=['user_id', 'username', 'role', 'login_count',
+                                         'assignments_submitted', 'score_sum', 'courses_enrolled'])
+        submitted = df['assignments_submitted'].astype(float)
+        df['avg_score'] = np.where(submitted > 0, df['score_sum'].astype(float) / submitted.where(submitted > 0, 1), 0.0)
+        df = df[['user_id', 'username', 'role', 'login_count', 'avg_score', 'courses_enrolled', 'assignments_submitted']]
         
         # AI Advisor - Rule-based recommendations
-        def get_ai_advice(row):
-            if row['avg_score'] < 5:
-                return "Bạn nên ôn lại các chương cơ bản và làm thêm bài tập."
-            elif row['login_count'] < 3:
-                return "Bạn cần dành thêm thời gian học, đăng nhập thường xuyên hơn."
-            elif row['avg_score'] >= 8:
-                return "Bạn đang học khá tốt, tiếp tục phát huy!"
-            else:
-                return "Bạn đang có tiến bộ tốt, hãy tiếp tục cố gắng!"
-        
-        df['ai_advice'] = df.apply(get_ai_advice, axis=1)
-        
-        return jsonify({
-            'total_users': len(users),
-            'total_courses': len(courses),
-            'total_enrollments': len(enrollments),
+        df['ai_advice'] = np.select(
+            [
+                df['avg_score'] < 5,
+                df['login_count'] < 3,
+                df['avg_score'] >= 8,
+            ],
+            [
+                "Bạn nên ôn lại các chương cơ bản và làm thêm bài tập.",
+                "Bạn cần dành thêm thời gian học, đăng nhập thường xuyên hơn.",
+                "Bạn đang học khá tốt, tiếp tục phát huy!",
+            ],
+            default="Bạn đang có tiến bộ tốt, hãy tiếp tục cố gắng!",
+        )
+        
+        # Averages cover every user matching the filter, not just this page, like the totals
+        avg_login_count, avg_score = user_activity_averages(role=role)
+        result = {
+            'total_users': User.query.count(),
+            'total_courses': Course.query.count(),
+            'total_enrollments': Enrollment.query.count(),
             'user_stats': df.to_dict('records'),
-            'avg_login_count': df['login_count'].mean(),
-            'avg_score': df['avg_score'].mean()
-        })
+            'avg_login_count': avg_login_count,
+            'avg_score': avg_score
+        }
+        if limit is not None:
+            result['next_cursor'] = int(df['user_id'].iloc[-1]) if len(df) == limit else None
+        return jsonify(result)
 
     @app.route('/api/analytics')
     @login_required
+    @read_replica
     def api_analytics():
         """API cho phân tích chi tiết - khác nhau giữa teacher và student"""
-        import pandas as pd
-        
         if current_user.is_teacher():
             # Giảng viên xem tất cả sinh viên
             students = User.query.filter_by(role='student').all()
+            all_stats = load_student_stats(student.id for student in students)
             student_data = []
             
             for student in students:
-                # Tính điểm trung bình của sinh viên
-                submissions = Submission.query.filter_by(student_id=student.id).all()
-                scores = [s.score for s in submissions if s.score is not None]
-                avg_score = sum(scores) / len(scores) if scores else 0
-                
-                # Đếm số lần đăng nhập
-                login_count = Log.query.filter_by(user_id=student.id, action='login').count()
-                
-                # Đếm số bài tập đã hoàn thành
-                assignments_completed = len(scores)
-                
-                # Đếm số khóa học đã đăng ký
-                courses_enrolled = Enrollment.query.filter_by(user_id=student.id).count()
+                stats = all_stats[student.id]
+                avg_score = stats.avg_score if stats.avg_score is not None else 0
                 
                 student_data.append({
                     'id': student.id,
                     'username': student.username,
                     'avg_score': round(avg_score, 1),
-                    'login_count': login_count,
-                    'assignments_completed': assignments_completed,
-                    'courses_enrolled': courses_enrolled
+                    'login_count': stats.login_count,
+                    'assignments_completed': stats.graded_count,
+                    'courses_enrolled': stats.courses_enrolled
                 })
             
             return jsonify({
@@ -1534,22 +1860,78 @@ def create_app() -> Flask:
         
         else:
             # Sinh viên chỉ xem dữ liệu của mình
-            submissions = Submission.query.filter_by(student_id=current_user.id).all()
-            scores = [s.score for s in submissions if s.score is not None]
-            avg_score = sum(scores) / len(scores) if scores else 0
-            
-            login_count = Log.query.filter_by(user_id=current_user.id, action='login').count()
-            assignments_completed = len(scores)
-            courses_enrolled = Enrollment.query.filter_by(user_id=current_user.id).count()
+            stats = get_student_stats(current_user.id)
+            avg_score = stats.avg_score if stats.avg_score is not None else 0
             
             return jsonify({
                 'role': 'student',
                 'avg_score': round(avg_score, 1),
-                'login_count': login_count,
-                'assignments_completed': assignments_completed,
-                'courses_enrolled': courses_enrolled
+                'login_count': stats.login_count,
+                'assignments_completed': stats.graded_count,
+                'courses_enrolled': stats.courses_enrolled
             })
 
+    @app.route('/api/grades')
+    @login_required
+    @read_replica
+    def api_grades():
+        """Bảng điểm dạng JSON cho giảng viên: ?course_id, ?sort=id|avg, ?order=asc|desc, ?limit, ?cursor"""
+        if not current_user.is_teacher():
+            return jsonify({'error': 'Chỉ giảng viên mới xem được bảng điểm.'}), 403
+        args = gradebook_args()
+        rows, next_cursor = gradebook_page(**args)
+        return jsonify({
+            'students': [
+                {
+                    'id': row.id,
+                    'username': row.username,
+                    'courses_count': row.courses_count,
+                    'submissions_count': row.submissions_count,
+                    'avg_score': round(row.avg_score, 1) if row.avg_score is not None else None,
+                }
+                for row in rows
+            ],
+            'course_id': args['course_id'],
+            'sort': args['sort'],
+            'order': 'desc' if args['descending'] else 'asc',
+            'next_cursor': next_cursor,
+        })
+
+    @app.route('/api/analytics/monthly')
+    @login_required
+    def api_analytics_monthly():
+        """Xu hướng lượt xem và bài nộp theo tháng cho biểu đồ của giảng viên"""
+        if not current_user.is_teacher():
+            return jsonify({'error': 'Chỉ giảng viên mới xem được xu hướng toàn hệ thống.'}), 403
+        months = min(max(request.args.get('months', 6, type=int), 1), 24)
+        return jsonify({'months': monthly_trends.series(months)})
+
+    @app.route('/request-profiles')
+    @login_required
+    def request_profiles():
+        """Các request đã được profile (?_profile=1), mới nhất trước; lọc theo ?endpoint"""
+        if not current_user.is_teacher():
+            flash('Chỉ giảng viên mới có thể xem profile.', 'danger')
+            return redirect(url_for('index'))
+        endpoint = request.args.get('endpoint') or None
+        profiles = request_profiler.recent()
+        return render_template('request_profiles.html',
+                               profiles=[p for p in profiles if not endpoint or p.get('endpoint') == endpoint],
+                               endpoints=sorted({p.get('endpoint') for p in profiles if p.get('endpoint')}),
+                               endpoint=endpoint,
+                               keep=request_profiler.keep)
+
+    @app.route('/request-profiles/<profile_id>.<kind>')
+    @login_required
+    def download_request_profile(profile_id, kind):
+        if not current_user.is_teacher():
+            abort(403)
+        path = request_profiler.path_of(profile_id, kind)
+        if path is None or not os.path.exists(path):
+            abort(404)
+        return send_file(path, as_attachment=True, download_name=os.path.basename(path),
+                         mimetype='application/octet-stream' if kind == 'prof' else 'text/plain')
+
     @app.route('/quick-action/<action>')
     @login_required
     def quick_action(action):
@@ -1644,6 +2026,9 @@ def create_app() -> Flask:
         
         db.session.add_all(logs)
         db.session.commit()
+        user_cache.clear()
+        profile_snapshots.clear()
+        monthly_trends.clear()
         
         flash('Dữ liệu mẫu đã được tạo thành công!', 'success')
         return redirect(url_for('index'))
@@ -0,0 +1,253 @@
+"""Set-based bulk operations behind the teacher import endpoints.
+
+Input rows are ``(row number, {column: value})`` pairs, from a JSON list or a CSV
+file. Every row is validated in one pass, with a fixed number of lookup queries
+whatever the row count. The valid rows are then applied in a single transaction
+(one executemany), and each invalid row is reported by number with the reason.
+"""
+import csv
+import io
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, or_, update
+
+from database import db, insert_ignore
+from models import User, Course, Enrollment, Submission
+from stats import record_grades, record_enrollments
+
+Rows = Iterable[Tuple[int, Mapping[str, Any]]]
+
+SCORE_MIN = 0.0
+SCORE_MAX = 10.0
+
+
+def read_csv_rows(file) -> List[Tuple[int, Dict[str, str]]]:
+    """Rows of an uploaded CSV file, numbered by line; headers are case-insensitive."""
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(content))
+    return [
+        (reader.line_num, {key.strip().lower(): (value or '').strip() for key, value in row.items() if key})
+        for row in reader
+    ]
+
+
+def json_rows(items, bare: Optional[Callable[[Any], Optional[Mapping[str, Any]]]] = None
+              ) -> List[Tuple[int, Mapping[str, Any]]]:
+    """Rows of a JSON list of objects, numbered from 1.
+
+    ``bare`` turns an item that is not an object into a row (None if it cannot);
+    without it, or when it returns None, such an item makes the whole list invalid.
+    """
+    if not isinstance(items, list):
+        raise ValueError('Dữ liệu phải là một danh sách.')
+    rows = []
+    for number, item in enumerate(items, start=1):
+        row = item if isinstance(item, Mapping) else (bare(item) if bare else None)
+        if row is None:
+            raise ValueError(f'Dòng {number} phải là một đối tượng.')
+        rows.append((number, row))
+    return rows
+
+
+def student_ref(item) -> Optional[Dict[str, Any]]:
+    """A bare item of a student list: an int is a ``student_id``, a string a ``username``."""
+    if isinstance(item, int) and not isinstance(item, bool):
+        return {'student_id': item}
+    if isinstance(item, str):
+        return {'username': item}
+    return None
+
+
+def _optional_int(row: Mapping[str, Any], key: str) -> Optional[int]:
+    value = row.get(key)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} không hợp lệ: {value!r}')
+
+
+def _score(row: Mapping[str, Any]) -> float:
+    value = row.get('score')
+    if isinstance(value, str):
+        # Accept the Vietnamese decimal comma, e.g. "8,5"
+        value = value.replace(',', '.')
+    if value is None or value == '':
+        raise ValueError('Thiếu điểm.')
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Điểm không hợp lệ: {value!r}')
+    if not SCORE_MIN <= score <= SCORE_MAX:
+        raise ValueError('Điểm phải từ 0 đến 10!')
+    return round(score, 1)
+
+
+def apply_grades(rows: Rows, dry_run: bool = False) -> Dict[str, Any]:
+    """Grade submissions from rows of ``submission_id`` or ``student_id``/``username`` +
+    ``assignment_id``, plus ``score``.
+
+    A student + assignment pair grades the student's latest submission for it.
+    Returns ``{'updated': n, 'errors': [{'row': n, 'error': msg}], 'dry_run': bool}``.
+    """
+    errors: List[Dict[str, Any]] = []
+    parsed = []  # (row number, submission_id, (student key, assignment_id), score)
+    for number, row in rows:
+        try:
+            score = _score(row)
+            submission_id = _optional_int(row, 'submission_id')
+            pair = None
+            if submission_id is None:
+                student = _optional_int(row, 'student_id') or (str(row.get('username') or '').strip() or None)
+                assignment_id = _optional_int(row, 'assignment_id')
+                if student is None or assignment_id is None:
+                    raise ValueError('Cần submission_id, hoặc student_id/username và assignment_id.')
+                pair = (student, assignment_id)
+            parsed.append((number, submission_id, pair, score))
+        except ValueError as exc:
+            errors.append({'row': number, 'error': str(exc)})
+
+    # Resolve every reference with one query per kind
+    usernames = {pair[0] for _, _, pair, _ in parsed if pair and isinstance(pair[0], str)}
+    user_ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames)).all()) \
+        if usernames else {}
+    pairs = set()
+    for _, _, pair, _ in parsed:
+        if pair:
+            student_id = user_ids.get(pair[0]) if isinstance(pair[0], str) else pair[0]
+            if student_id is not None:
+                pairs.add((student_id, pair[1]))
+    latest = {}
+    if pairs:
+        latest = {
+            (student_id, assignment_id): submission_id
+            for student_id, assignment_id, submission_id in db.session.query(
+                Submission.student_id, Submission.assignment_id, func.max(Submission.id)
+            ).filter(
+                Submission.student_id.in_({p[0] for p in pairs}),
+                Submission.assignment_id.in_({p[1] for p in pairs}),
+            ).group_by(Submission.student_id, Submission.assignment_id).all()
+        }
+    wanted = {submission_id for _, submission_id, _, _ in parsed if submission_id is not None} | set(latest.values())
+    current = {
+        submission_id: (student_id, score)
+        for submission_id, student_id, score in db.session.query(
+            Submission.id, Submission.student_id, Submission.score
+        ).filter(Submission.id.in_(wanted)).all()
+    } if wanted else {}
+
+    updates, changes, seen = [], [], {}
+    for number, submission_id, pair, score in parsed:
+        if pair:
+            student_id = user_ids.get(pair[0]) if isinstance(pair[0], str) else pair[0]
+            if student_id is None:
+                errors.append({'row': number, 'error': f'Không tìm thấy sinh viên {pair[0]}.'})
+                continue
+            submission_id = latest.get((student_id, pair[1]))
+            if submission_id is None:
+                errors.append({'row': number, 'error': f'Sinh viên {pair[0]} chưa nộp bài tập {pair[1]}.'})
+                continue
+        if submission_id not in current:
+            errors.append({'row': number, 'error': f'Không tìm thấy bài nộp {submission_id}.'})
+            continue
+        if submission_id in seen:
+            errors.append({'row': number, 'error': f'Bài nộp {submission_id} đã có ở dòng {seen[submission_id]}.'})
+            continue
+        seen[submission_id] = number
+        student_id, old_score = current[submission_id]
+        updates.append({'id': submission_id, 'score': score})
+        changes.append((student_id, old_score, score))
+
+    if updates and not dry_run:
+        # ORM bulk UPDATE by primary key: a single executemany
+        db.session.execute(update(Submission), updates)
+        record_grades(changes)
+        db.session.commit()
+
+    errors.sort(key=lambda error: error['row'])
+    return {'updated': len(updates), 'errors': errors, 'dry_run': dry_run}
+
+
+def apply_enrollments(rows: Rows, course_id: Optional[int] = None, unenroll: bool = False,
+                      dry_run: bool = False) -> Dict[str, Any]:
+    """Enroll (or unenroll) students given by ``student_id`` or ``username``.
+
+    Each row may name its own ``course_id``; ``course_id`` is the default. Students
+    already enrolled (or, when unenrolling, not enrolled) and repeated rows are
+    skipped; names that are not students are counted as unknown.
+    """
+    errors: List[Dict[str, Any]] = []
+    parsed = []  # (row number, student key, course_id)
+    for number, row in rows:
+        try:
+            student = _optional_int(row, 'student_id') or (str(row.get('username') or '').strip() or None)
+            course = _optional_int(row, 'course_id') or course_id
+            if student is None:
+                raise ValueError('Cần student_id hoặc username.')
+            if course is None:
+                raise ValueError('Cần course_id.')
+            parsed.append((number, student, course))
+        except ValueError as exc:
+            errors.append({'row': number, 'error': str(exc)})
+
+    names = {student for _, student, _ in parsed if isinstance(student, str)}
+    ids = {student for _, student, _ in parsed if isinstance(student, int)}
+    by_name, known_ids = {}, set()
+    if parsed:
+        for user_id, username in db.session.query(User.id, User.username).filter(
+                User.role == 'student', or_(User.username.in_(names), User.id.in_(ids))).all():
+            by_name[username] = user_id
+            known_ids.add(user_id)
+    course_ids = {course for _, _, course in parsed}
+    known_courses = {course for (course,) in db.session.query(Course.id).filter(Course.id.in_(course_ids)).all()} \
+        if course_ids else set()
+
+    unknown, pairs, resolved = [], set(), 0
+    for number, student, course in parsed:
+        user_id = by_name.get(student) if isinstance(student, str) else (student if student in known_ids else None)
+        if user_id is None:
+            unknown.append(student)
+            continue
+        if course not in known_courses:
+            errors.append({'row': number, 'error': f'Không tìm thấy khóa học {course}.'})
+            continue
+        resolved += 1
+        pairs.add((user_id, course))
+
+    existing = set()
+    if pairs:
+        existing = set(db.session.query(Enrollment.user_id, Enrollment.course_id).filter(
+            Enrollment.user_id.in_({user_id for user_id, _ in pairs}),
+            Enrollment.course_id.in_({course for _, course in pairs}),
+        ).all())
+    targets = pairs & existing if unenroll else pairs - existing
+
+    if targets and not dry_run:
+        if unenroll:
+            by_course = defaultdict(list)
+            for user_id, course in targets:
+                by_course[course].append(user_id)
+            for course, user_ids in by_course.items():
+                Enrollment.query.filter(Enrollment.course_id == course, Enrollment.user_id.in_(user_ids)) \
+                    .delete(synchronize_session=False)
+        else:
+            insert_ignore(Enrollment.__table__, [{'user_id': user_id, 'course_id': course}
+                                                 for user_id, course in sorted(targets)])
+        sign = -1 if unenroll else 1
+        record_enrollments({user_id: sign * count for user_id, count in Counter(u for u, _ in targets).items()})
+        db.session.commit()
+
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'added': 0 if unenroll else len(targets),
+        'removed': len(targets) if unenroll else 0,
+        'skipped': resolved - len(targets),
+        'unknown': len(unknown),
+        'unknown_students': unknown,
+        'errors': errors,
+        'dry_run': dry_run,
+    }
@@ -0,0 +1,62 @@
+"""Counters shown on the home page dashboard.
+
+All four counts come from one statement, cached for ``ttl`` seconds. Any ORM
+commit that adds, changes or deletes a user, course or enrollment clears the
+cache of the current app, so this process shows new data at once; the TTL
+covers writes made by other worker processes and Core bulk inserts
+(``bulk.py``, ``flask gen-data``), which bypass the session events.
+"""
+from itertools import chain
+from typing import Dict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+
+from ai_cache import ResponseCache
+from database import db, RoutingSession
+from models import User, Course, Enrollment
+
+COUNTED_MODELS = (User, Course, Enrollment)
+
+
+def dashboard_counts() -> Dict[str, int]:
+    users, students, courses, enrollments = db.session.execute(select(
+        select(func.count(User.id)).scalar_subquery(),
+        select(func.count(User.id)).where(User.role == 'student').scalar_subquery(),
+        select(func.count(Course.id)).scalar_subquery(),
+        select(func.count()).select_from(Enrollment).scalar_subquery(),
+    )).one()
+    return {'users': users, 'students': students, 'courses': courses, 'enrollments': enrollments}
+
+
+class DashboardCounters:
+    """Returned dicts are shared: treat them as read-only."""
+
+    def __init__(self, ttl: float = 30.0):
+        self._cache = ResponseCache(maxsize=1, ttl=ttl)
+
+    def get(self) -> Dict[str, int]:
+        counts, _ = self._cache.get_or_compute('counts', dashboard_counts)
+        return counts
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_counted_changes(session, flush_context):
+    if any(isinstance(obj, COUNTED_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info['dashboard_stale'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _clear_after_commit(session):
+    if session.info.pop('dashboard_stale', False) and has_app_context():
+        counters = current_app.extensions.get('dashboard_counters')
+        if counters is not None:
+            counters.clear()
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _forget_rolled_back(session, previous_transaction):
+    session.info.pop('dashboard_stale', None)
@@ -1,6 +1,99 @@
+from typing import Any, Dict, List, Tuple
+
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_migrate import Migrate
+from sqlalchemy import event, insert
+from sqlalchemy.sql.dml import UpdateBase
+
+# Bind key of the optional read-only database (DATABASE_READ_URL), see db_routing.py
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica bind while a ``read_replica`` view runs.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary, and
+    mark the request as having written (``g.db_wrote``).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g.db_wrote = True
+            elif g.get('db_replica') and getattr(clause, 'is_select', False):
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 
 # Global DB instance
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
+
+
+def insert_ignore(table, rows: List[Dict[str, Any]]) -> int:
+    """Insert ``rows`` in one executemany, skipping rows that hit a unique constraint.
+
+    Returns the number of rows actually inserted.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).on_conflict_do_nothing()  # INSERT OR IGNORE
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table).on_conflict_do_nothing()
+    elif dialect in ('mysql', 'mariadb'):
+        statement = insert(table).prefix_with('IGNORE')
+    else:
+        statement = insert(table)
+    return db.session.execute(statement, rows).rowcount
+
+
+def engine_options(config) -> Dict[str, Any]:
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database: pool sizing for threaded servers."""
+    url = config['SQLALCHEMY_DATABASE_URI']
+    if url.startswith('sqlite') and (url in ('sqlite://', 'sqlite:///:memory:') or ':memory:' in url):
+        # In-memory SQLite uses a single-connection pool that takes no sizing options
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if not url.startswith('sqlite'):
+        # Server databases drop idle connections; SQLite files never do
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = 1800
+    return options
+
+
+def sqlite_pragmas(config, read_only: bool = False) -> List[Tuple[str, Any]]:
+    """PRAGMAs run on every new SQLite connection, in order."""
+    pragmas = [
+        # busy_timeout first, so the journal_mode switch itself waits for a lock
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        # A read-only connection cannot change the journal mode; it follows the file's
+        ('journal_mode', None if read_only else config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('foreign_keys', 'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'),
+    ]
+    return [(name, value) for name, value in pragmas if value not in (None, '')]
+
+
+def apply_sqlite_pragmas(engine, pragmas: List[Tuple[str, Any]]) -> None:
+    """Run ``pragmas`` on each connection ``engine`` opens (no-op for other databases)."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
@@ -0,0 +1,179 @@
+"""Synthetic data at production scale for load tests and benchmarks (``flask gen-data``).
+
+Everything is derived from one seed, so the same arguments always produce the same
+database. Rows are produced by generators and written with Core ``executemany`` in
+batches of ``batch_size``, inside one transaction; only the per-student list of
+course ids is kept in memory, so memory does not grow with the number of
+submissions or logs.
+
+Accounts use the demo passwords (``teacher123`` / ``student123``); the hash is
+computed once per role because password hashing would otherwise dominate the run.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from werkzeug.security import generate_password_hash
+
+from models import User, Course, Enrollment, Assignment, Submission, Log
+
+SUBJECTS = ['Lập trình', 'Cơ sở dữ liệu', 'Mạng máy tính', 'Toán rời rạc', 'Hệ điều hành', 'Trí tuệ nhân tạo',
+            'Phát triển Web', 'Kiến trúc máy tính', 'Xác suất thống kê', 'Học máy', 'An toàn thông tin',
+            'Công nghệ phần mềm', 'Đồ họa máy tính', 'Phân tích dữ liệu', 'Điện toán đám mây']
+LEVELS = ['cơ bản', 'nâng cao', 'ứng dụng', 'chuyên sâu', 'thực hành']
+TASKS = ['Bài tập', 'Lab', 'Đồ án', 'Kiểm tra', 'Quiz']
+# Share of each logged action (a submission also gets its own submit_assignment log)
+LOG_ACTIONS = [('login', 0.3), ('view_material', 0.7)]
+
+
+def parse_count(value) -> int:
+    """``'500'``, ``'50k'`` or ``'10M'`` as an int."""
+    text = str(value).strip().lower().replace('_', '')
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    try:
+        return int(float(number) * multiplier)
+    except ValueError:
+        raise ValueError(f'invalid count: {value!r}')
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class DatasetGenerator:
+    def __init__(self, students: int, courses: int, teachers: int, logs: int, seed: int = 42,
+                 days: int = 180, now: Optional[datetime] = None):
+        self.students = students
+        self.courses = courses
+        self.teachers = teachers
+        self.logs = logs
+        self.seed = seed
+        self.days = days
+        self.now = now or datetime.utcnow().replace(microsecond=0)
+        # Filled while generating; ids are assigned here, not by the database
+        self.student_courses: List[List[int]] = []
+        self.course_assignments: Dict[int, List[int]] = {}
+
+    def _rng(self, stream: str) -> random.Random:
+        # One independent stream per table, so changing one size does not reshuffle the others
+        return random.Random(f"{self.seed}:{stream}")
+
+    def _timestamp(self, rnd: random.Random) -> datetime:
+        return self.now - timedelta(seconds=rnd.randrange(self.days * 86400))
+
+    def users(self) -> Iterator[dict]:
+        teacher_hash = generate_password_hash('teacher123')
+        student_hash = generate_password_hash('student123')
+        for n in range(1, self.teachers + 1):
+            yield {'id': n, 'username': f'teacher{n}', 'password_hash': teacher_hash, 'role': 'teacher'}
+        for n in range(1, self.students + 1):
+            yield {'id': self.teachers + n, 'username': f'student{n}', 'password_hash': student_hash,
+                   'role': 'student'}
+
+    def course_rows(self) -> Iterator[dict]:
+        rnd = self._rng('courses')
+        for course_id in range(1, self.courses + 1):
+            subject, level = rnd.choice(SUBJECTS), rnd.choice(LEVELS)
+            yield {
+                'id': course_id,
+                'name': f'{subject} {level} {course_id}',
+                'description': f'Khóa học {subject.lower()} {level}: lý thuyết, bài tập và đồ án.',
+                'teacher_id': rnd.randint(1, self.teachers),
+            }
+
+    def assignments(self) -> Iterator[dict]:
+        rnd = self._rng('assignments')
+        assignment_id = 0
+        for course_id in range(1, self.courses + 1):
+            ids = self.course_assignments[course_id] = []
+            for n in range(1, rnd.randint(3, 12) + 1):
+                assignment_id += 1
+                ids.append(assignment_id)
+                yield {
+                    'id': assignment_id,
+                    'course_id': course_id,
+                    'title': f'{rnd.choice(TASKS)} {n}',
+                    'deadline': self.now + timedelta(days=rnd.randint(-self.days, 30)),
+                }
+
+    def enrollments(self) -> Iterator[dict]:
+        rnd = self._rng('enrollments')
+        # A few popular courses, a long tail of small ones
+        weights = [1 / (rank + 1) ** 0.8 for rank in range(self.courses)]
+        rnd.shuffle(weights)
+        cumulative = list(accumulate(weights))
+        course_ids = range(1, self.courses + 1)
+        self.student_courses = []
+        for n in range(self.students):
+            wanted = min(rnd.randint(2, 6), self.courses)
+            chosen = set()
+            while len(chosen) < wanted:
+                chosen.update(rnd.choices(course_ids, cum_weights=cumulative, k=wanted - len(chosen)))
+            chosen = sorted(chosen)
+            self.student_courses.append(chosen)
+            for course_id in chosen:
+                yield {'user_id': self.teachers + 1 + n, 'course_id': course_id}
+
+    def submissions(self) -> Iterator[dict]:
+        rnd = self._rng('submissions')
+        for n, course_ids in enumerate(self.student_courses):
+            user_id = self.teachers + 1 + n
+            ability = min(max(rnd.gauss(7.0, 1.2), 3.0), 9.8)
+            diligence = rnd.uniform(0.3, 0.95)
+            for course_id in course_ids:
+                for assignment_id in self.course_assignments[course_id]:
+                    if rnd.random() > diligence:
+                        continue
+                    graded = rnd.random() < 0.85
+                    score = round(min(max(rnd.gauss(ability, 1.5), 0.0), 10.0), 1) if graded else None
+                    yield {'assignment_id': assignment_id, 'student_id': user_id, 'score': score,
+                           'course_id': course_id}
+
+    def log_rows(self, submissions: Iterable[dict]) -> Iterator[dict]:
+        """One submit_assignment log per submission, then ``logs`` login/view rows."""
+        rnd = self._rng('logs')
+        for row in submissions:
+            yield {'user_id': row['student_id'], 'course_id': row['course_id'],
+                   'action': 'submit_assignment', 'timestamp': self._timestamp(rnd)}
+        actions = [action for action, _ in LOG_ACTIONS]
+        cumulative = list(accumulate(share for _, share in LOG_ACTIONS))
+        for _ in range(self.logs):
+            # Activity is skewed: low student numbers are the most active
+            n = int(self.students * rnd.random() ** 1.5)
+            action = rnd.choices(actions, cum_weights=cumulative)[0]
+            course_ids = self.student_courses[n]
+            yield {
+                'user_id': self.teachers + 1 + n,
+                'course_id': rnd.choice(course_ids) if action == 'view_material' else None,
+                'action': action,
+                'timestamp': self._timestamp(rnd),
+            }
+
+    def write(self, conn, batch_size: int = 10000, echo: Callable[[str], None] = print) -> Dict[str, int]:
+        """Insert everything through ``conn`` (call inside a transaction). Returns row counts."""
+        counts = {}
+
+        def load(name, table, rows):
+            count = 0
+            for batch in _batches(rows, batch_size):
+                conn.execute(table.insert(), batch)
+                count += len(batch)
+            counts[name] = count
+            echo(f'  {name}: {count}')
+
+        load('users', User.__table__, self.users())
+        load('courses', Course.__table__, self.course_rows())
+        load('assignments', Assignment.__table__, self.assignments())
+        load('enrollments', Enrollment.__table__, self.enrollments())
+        # Submissions and their logs come from the same stream: generate it twice from the seed
+        load('submissions', Submission.__table__,
+             ({k: v for k, v in row.items() if k != 'course_id'} for row in self.submissions()))
+        load('logs', Log.__table__, self.log_rows(self.submissions()))
+        return counts
@@ -0,0 +1,128 @@
+"""Read/write routing to an optional read-only database.
+
+Set ``DATABASE_READ_URL`` to a replica, or to a read-only connection to the same
+SQLite file (``sqlite:///file:lms.db?mode=ro&uri=true``), and decorate heavy
+read-only views with ``@read_replica``. While such a view runs, its SELECTs go
+to the replica bind (see ``database.RoutingSession``); writes always go to the
+primary.
+
+The replica is used only when all of these hold:
+
+- it answered its last health check, which runs at most every
+  ``check_interval`` seconds and measures the replication lag where the
+  database reports it (PostgreSQL); other databases only get a connectivity
+  check;
+- its lag is at most ``max_lag`` seconds;
+- the user has not written anything in the last ``max_lag`` seconds, so users
+  always read their own writes.
+
+Otherwise the view reads from the primary. If a query fails on the replica
+mid-request, the replica is marked unhealthy and the view is run again on the
+primary.
+"""
+import functools
+import logging
+import threading
+import time
+from typing import Callable
+
+from flask import current_app, g, session
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Flask session key: wall-clock time of the user's last write to the primary
+LAST_WRITE_KEY = 'db_last_write'
+
+POSTGRES_LAG = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END"
+)
+
+
+class ReadRouter:
+    def __init__(self, app, engine, max_lag: float = 5.0, check_interval: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._healthy = False
+        self._checked_at = None
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+        app.after_request(self._remember_write)
+
+    def lag(self) -> float:
+        """Replication lag in seconds (0 where the database does not report it)."""
+        with self.engine.connect() as conn:
+            if self.engine.dialect.name == 'postgresql':
+                return float(conn.execute(POSTGRES_LAG).scalar() or 0)
+            conn.execute(text('SELECT 1'))
+            return 0.0
+
+    def healthy(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._healthy
+            self._checked_at = now
+        try:
+            lag = self.lag()
+        except SQLAlchemyError as exc:
+            logger.warning('Read replica unavailable, reading from the primary: %s', exc)
+            healthy = False
+        else:
+            healthy = lag <= self.max_lag
+            if not healthy:
+                logger.warning('Read replica is %.1fs behind (limit %.1fs), reading from the primary',
+                               lag, self.max_lag)
+        with self._lock:
+            self._healthy = healthy
+        return healthy
+
+    def use_replica(self) -> bool:
+        if time.time() - session.get(LAST_WRITE_KEY, 0) < self.max_lag:
+            # Read your own writes: the replica may not have them yet
+            return False
+        return self.healthy()
+
+    def mark_unhealthy(self, exc: Exception) -> None:
+        logger.warning('Read replica query failed, retrying on the primary: %s', exc)
+        with self._lock:
+            self._healthy = False
+            self._checked_at = self._clock()
+
+    def _remember_write(self, response):
+        if g.pop('db_wrote', False):
+            session[LAST_WRITE_KEY] = time.time()
+        return response
+
+
+def read_replica(view):
+    """Run the view's SELECTs on the read replica when one is configured and usable."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions.get('db_router')
+        if router is None or not router.use_replica():
+            return view(*args, **kwargs)
+        g.db_replica = True
+        try:
+            response = view(*args, **kwargs)
+            router.replica_reads += 1
+            return response
+        except OperationalError as exc:
+            router.mark_unhealthy(exc)
+            router.primary_fallbacks += 1
+            db.session.rollback()
+            g.db_replica = False
+            return view(*args, **kwargs)
+        finally:
+            g.db_replica = False
+
+    return wrapper
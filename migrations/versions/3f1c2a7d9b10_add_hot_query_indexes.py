@@ -0,0 +1,53 @@
+"""add indexes for the hot query shapes
+
+Revision ID: 3f1c2a7d9b10
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+Databases created before this migration came from ``db.create_all()``, so this
+revision only adds the indexes that are missing on tables that already exist.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_log_user_id_action', 'log', ['user_id', 'action']),
+    ('ix_log_course_id_timestamp', 'log', ['course_id', 'timestamp']),
+    ('ix_submission_student_id', 'submission', ['student_id']),
+    ('ix_submission_assignment_id', 'submission', ['assignment_id']),
+    ('ix_enrollment_course_id', 'enrollment', ['course_id']),
+    ('ix_assignment_course_id', 'assignment', ['course_id']),
+    ('ix_course_teacher_id', 'course', ['teacher_id']),
+]
+
+
+def _existing_indexes():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    return tables, {
+        (table, index['name'])
+        for table in tables
+        for index in inspector.get_indexes(table)
+    }
+
+
+def upgrade():
+    tables, existing = _existing_indexes()
+    for name, table, columns in INDEXES:
+        if table in tables and (table, name) not in existing:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    tables, existing = _existing_indexes()
+    for name, table, _ in reversed(INDEXES):
+        if (table, name) in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,27 @@
+"""add FTS5 search index
+
+Revision ID: 8b2e4f6a1c3d
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-18 14:00:00.000000
+
+Creates the ``search_index`` FTS5 table with its sync triggers and fills it from
+the existing rows. No-op on backends without FTS5 (search falls back to LIKE).
+"""
+from alembic import op
+
+from search import create_search_index, drop_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4f6a1c3d'
+down_revision = '3f1c2a7d9b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_search_index(op.get_bind())
+
+
+def downgrade():
+    drop_search_index(op.get_bind())
@@ -0,0 +1,30 @@
+"""add submission.file_name
+
+Revision ID: c47d91e2a5b8
+Revises: 8b2e4f6a1c3d
+Create Date: 2026-10-18 16:00:00.000000
+
+Uploads are now stored by content hash, so the original file name is kept in
+its own column.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47d91e2a5b8'
+down_revision = '8b2e4f6a1c3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('submission')}
+    if 'file_name' not in columns:
+        with op.batch_alter_table('submission') as batch_op:
+            batch_op.add_column(sa.Column('file_name', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('submission') as batch_op:
+        batch_op.drop_column('file_name')
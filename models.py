@@ -33,7 +33,7 @@ class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     
     # Relationships
     enrollments = db.relationship('Enrollment', backref='course', lazy=True)
@@ -42,12 +42,13 @@ class Course(db.Model):
 
 class Enrollment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    # The (user_id, course_id) primary key covers lookups by user; this one covers by course
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True, index=True)
 
 
 class Assignment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
     deadline = db.Column(db.DateTime)
     
@@ -57,16 +58,64 @@ class Assignment(db.Model):
 
 class Submission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False, index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     score = db.Column(db.Float)
-    # Optional path to uploaded file (assignment submission)
+    # Optional uploaded file: blob path in the upload store (``ab/cd/<sha256>``) and original name
     file_path = db.Column(db.String(255), nullable=True)
+    file_name = db.Column(db.String(255), nullable=True)
 
 
 class Log(db.Model):
+    __table_args__ = (
+        db.Index('ix_log_user_id_action', 'user_id', 'action'),
+        db.Index('ix_log_course_id_timestamp', 'course_id', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
     action = db.Column(db.String(100), nullable=False)  # login, view_material, submit_assignment
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class StudentStats(db.Model):
+    """Per-user rollup kept in sync by the writes that change it (see stats.py)."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    login_count = db.Column(db.Integer, nullable=False, default=0)
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)  # submissions with a score
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    courses_enrolled = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def avg_score(self):
+        """Average over graded submissions, or None if nothing is graded yet."""
+        return self.score_sum / self.graded_count if self.graded_count else None
+
+
+class LogDailyRollup(db.Model):
+    """Per-day activity counts for every log row up to the rollup watermark (see rollups.py).
+
+    A (day, user, course, action) key may appear in several rows when late log rows
+    are rolled up after their day; readers always SUM ``count``.
+    """
+    __table_args__ = (
+        db.Index('ix_log_daily_rollup_user_id_action', 'user_id', 'action'),
+        db.Index('ix_log_daily_rollup_day', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    course_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RollupState(db.Model):
+    """Watermark of a rollup: every source row with id <= last_id has been rolled up."""
+    name = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,124 @@
+"""Learning-profile snapshots used as context for the AI assistant.
+
+Each profile is built with one or two aggregate queries and memoized per user, so
+repeated chat turns do not touch the database. Views call ``invalidate`` after
+committing a grade, submission, enrollment or assignment change; the TTL bounds
+staleness across worker processes, which do not share the in-memory cache.
+"""
+from typing import Any, Dict
+
+from sqlalchemy import func
+
+from ai_cache import ResponseCache
+from database import db
+from models import Course, Enrollment, Assignment, Submission, Log
+from stats import get_student_stats
+
+RECENT_TOPICS = 5
+RECENT_EVENTS = 5
+
+
+def build_student_profile(user_id: int) -> Dict[str, Any]:
+    stats = get_student_stats(user_id)
+    avg_score = stats.avg_score
+
+    # Distinct assignment titles, most recently submitted first
+    latest = func.max(Submission.id)
+    recent_topics = [
+        title for title, _ in db.session.query(Assignment.title, latest)
+        .join(Submission, Submission.assignment_id == Assignment.id)
+        .filter(Submission.student_id == user_id)
+        .group_by(Assignment.title)
+        .order_by(latest.desc())
+        .limit(RECENT_TOPICS)
+        .all()
+    ]
+
+    return {
+        'avg_score': round(avg_score, 1) if avg_score is not None else None,
+        'login_count': stats.login_count,
+        'assignments_completed': stats.graded_count,
+        'courses_enrolled': stats.courses_enrolled,
+        'recent_topics': recent_topics,
+    }
+
+
+def build_teacher_profile(user_id: int) -> Dict[str, Any]:
+    enrollments = db.session.query(Enrollment.course_id, func.count().label('n')) \
+        .group_by(Enrollment.course_id).subquery()
+    assignments = db.session.query(Assignment.course_id, func.count(Assignment.id).label('n')) \
+        .group_by(Assignment.course_id).subquery()
+    scores = db.session.query(
+        Assignment.course_id,
+        func.sum(Submission.score).label('total'),
+        func.count(Submission.score).label('n'),
+    ).join(Submission, Submission.assignment_id == Assignment.id) \
+        .group_by(Assignment.course_id).subquery()
+
+    rows = db.session.query(
+        Course.id,
+        Course.name,
+        func.coalesce(enrollments.c.n, 0),
+        func.coalesce(assignments.c.n, 0),
+        scores.c.total,
+        func.coalesce(scores.c.n, 0),
+    ).outerjoin(enrollments, enrollments.c.course_id == Course.id) \
+        .outerjoin(assignments, assignments.c.course_id == Course.id) \
+        .outerjoin(scores, scores.c.course_id == Course.id) \
+        .filter(Course.teacher_id == user_id) \
+        .order_by(Course.id) \
+        .all()
+
+    course_ids = [row[0] for row in rows]
+    total_students = 0
+    avg_scores = []
+    course_summaries = []
+    for _, name, enrollment_count, assignment_count, score_total, score_count in rows:
+        total_students += enrollment_count
+        if score_count:
+            avg_scores.append(score_total / score_count)
+        course_summaries.append(f"{name}: {enrollment_count} sinh viên, {assignment_count} bài tập")
+
+    recent_logs = Log.query.filter(Log.course_id.in_(course_ids)) \
+        .order_by(Log.timestamp.desc()).limit(RECENT_EVENTS).all() if course_ids else []
+
+    return {
+        'courses': [row[1] for row in rows],
+        'total_students': total_students,
+        'avg_score': round(sum(avg_scores) / len(avg_scores), 1) if avg_scores else None,
+        'course_summaries': course_summaries,
+        'recent_events': [
+            {
+                'action': log.action,
+                'user_id': log.user_id,
+                'course_id': log.course_id,
+                'timestamp': log.timestamp.isoformat() if log.timestamp else None,
+            }
+            for log in recent_logs
+        ],
+    }
+
+
+class ProfileSnapshots:
+    """Per-user memo of the profiles above. Returned dicts are shared: treat them as read-only."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 120.0):
+        self._cache = ResponseCache(maxsize=maxsize, ttl=ttl)
+
+    def student(self, user_id: int) -> Dict[str, Any]:
+        profile, _ = self._cache.get_or_compute(('student', user_id), lambda: build_student_profile(user_id))
+        return profile
+
+    def teacher(self, user_id: int) -> Dict[str, Any]:
+        profile, _ = self._cache.get_or_compute(('teacher', user_id), lambda: build_teacher_profile(user_id))
+        return profile
+
+    def invalidate(self, *user_ids: int) -> None:
+        for user_id in user_ids:
+            if user_id is None:
+                continue
+            self._cache.delete(('student', user_id))
+            self._cache.delete(('teacher', user_id))
+
+    def clear(self) -> None:
+        self._cache.clear()
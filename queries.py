@@ -0,0 +1,261 @@
+"""Set-based aggregate queries used by the analytics pages.
+
+Each helper issues a fixed number of GROUP BY / JOIN statements, so the cost of a
+page does not grow with the number of students or courses.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import Float, func, case, cast, and_, or_, select
+
+from database import db
+from models import User, Course, Enrollment, Assignment, Submission
+from rollups import action_counts, user_action_count_subquery
+
+
+def score_summary() -> Dict[str, Any]:
+    """Submission count, average score and score distribution in one query.
+
+    Like the original page, only truthy scores (graded and non-zero) are counted in
+    the average and in the distribution buckets.
+    """
+    graded = and_(Submission.score.isnot(None), Submission.score != 0)
+    row = db.session.query(
+        func.count(Submission.id),
+        func.avg(case((graded, Submission.score))),
+        func.sum(case((and_(graded, Submission.score >= 9), 1), else_=0)),
+        func.sum(case((and_(graded, Submission.score >= 7, Submission.score < 9), 1), else_=0)),
+        func.sum(case((and_(graded, Submission.score >= 5, Submission.score < 7), 1), else_=0)),
+        func.sum(case((and_(graded, Submission.score < 5), 1), else_=0)),
+    ).one()
+    total, avg_score, excellent, good, average, poor = row
+    return {
+        'total_submissions': total or 0,
+        'avg_score': float(avg_score) if avg_score is not None else 0,
+        'score_distribution': {
+            'excellent': int(excellent or 0),
+            'good': int(good or 0),
+            'average': int(average or 0),
+            'poor': int(poor or 0),
+        },
+    }
+
+
+def log_action_counts() -> Dict[str, int]:
+    """Number of log rows per action (daily rollups plus the recent raw tail)."""
+    return action_counts()
+
+
+def possible_submissions_count() -> int:
+    """Sum over students of the assignments in every course they are enrolled in."""
+    total = db.session.query(func.count(Assignment.id)) \
+        .select_from(Enrollment) \
+        .join(User, and_(User.id == Enrollment.user_id, User.role == 'student')) \
+        .join(Assignment, Assignment.course_id == Enrollment.course_id) \
+        .scalar()
+    return total or 0
+
+
+def enrollments_per_course() -> Dict[str, int]:
+    """Enrollment count keyed by course name, in course id order."""
+    rows = db.session.query(Course.name, func.count(Enrollment.user_id)) \
+        .outerjoin(Enrollment, Enrollment.course_id == Course.id) \
+        .group_by(Course.id, Course.name) \
+        .order_by(Course.id) \
+        .all()
+    # Same semantics as the old per-course loop: a later course with the same name wins
+    result = {}
+    for name, count in rows:
+        result[name] = count
+    return result
+
+
+def teacher_analytics_summary() -> Dict[str, Any]:
+    """All numbers shown on the teacher analytics page, with a constant number of queries."""
+    total_students = User.query.filter_by(role='student').count()
+    scores = score_summary()
+    actions = log_action_counts()
+    total_possible_submissions = possible_submissions_count()
+
+    completion_rate = (scores['total_submissions'] / total_possible_submissions * 100) if total_possible_submissions > 0 else 0
+
+    per_course = enrollments_per_course()
+    top_courses = dict(sorted(per_course.items(), key=lambda x: x[1], reverse=True)[:5]) if per_course else {}
+
+    return {
+        'total_views': actions.get('view_material', 0),
+        'total_logins': actions.get('login', 0),
+        'avg_score': scores['avg_score'],
+        'completion_rate': completion_rate,
+        'score_distribution': scores['score_distribution'],
+        'top_courses': top_courses,
+        'total_students': total_students,
+        'total_submissions': scores['total_submissions'],
+    }
+
+
+def course_counts() -> Tuple[Dict[int, int], Dict[int, int]]:
+    """``({course_id: enrolled students}, {course_id: assignments})`` for every course."""
+    students = dict(db.session.query(Enrollment.course_id, func.count()).group_by(Enrollment.course_id).all())
+    assignments = dict(db.session.query(Assignment.course_id, func.count(Assignment.id))
+                       .group_by(Assignment.course_id).all())
+    return students, assignments
+
+
+def course_submission_stats(course_id: int) -> Dict[int, Tuple[int, float]]:
+    """``{student_id: (submissions, average score)}`` for one course, in one grouped query.
+
+    Ungraded submissions count as submitted but are left out of the average.
+    """
+    rows = db.session.query(Submission.student_id, func.count(Submission.id), func.avg(Submission.score)) \
+        .join(Assignment, Assignment.id == Submission.assignment_id) \
+        .filter(Assignment.course_id == course_id) \
+        .group_by(Submission.student_id) \
+        .all()
+    return {student_id: (count, float(avg) if avg is not None else 0) for student_id, count, avg in rows}
+
+
+def user_activity_query(role=None):
+    """``user_activity_rows`` as a query, filtered by ``role`` but not paginated."""
+    logins = user_action_count_subquery('login')
+    graded = and_(Submission.score.isnot(None), Submission.score != 0)
+    subs = db.session.query(
+        Submission.student_id.label('user_id'),
+        func.count(Submission.id).label('submissions'),
+        func.sum(case((graded, Submission.score), else_=0)).label('score_sum'),
+    ).group_by(Submission.student_id).subquery()
+    enrolls = db.session.query(Enrollment.user_id.label('user_id'), func.count().label('courses_enrolled')) \
+        .group_by(Enrollment.user_id) \
+        .subquery()
+
+    query = db.session.query(
+        User.id,
+        User.username,
+        User.role,
+        func.coalesce(logins.c.n, 0).label('login_count'),
+        func.coalesce(subs.c.submissions, 0).label('submissions'),
+        func.coalesce(subs.c.score_sum, 0).label('score_sum'),
+        func.coalesce(enrolls.c.courses_enrolled, 0).label('courses_enrolled'),
+    ).outerjoin(logins, logins.c.user_id == User.id) \
+        .outerjoin(subs, subs.c.user_id == User.id) \
+        .outerjoin(enrolls, enrolls.c.user_id == User.id)
+
+    if role:
+        query = query.filter(User.role == role)
+    return query
+
+
+def user_activity_rows(role=None, after_id=None, limit=None):
+    """Per-user login count, submission count, score sum and enrollment count.
+
+    Returns ``(id, username, role, login_count, submissions, score_sum,
+    courses_enrolled)`` tuples ordered by user id. The three per-user counts are
+    pre-aggregated in grouped subqueries and outer-joined onto ``user``, so this is
+    one statement regardless of table sizes. ``after_id``/``limit`` give keyset
+    pagination over user ids.
+    """
+    query = user_activity_query(role)
+    if after_id is not None:
+        query = query.filter(User.id > after_id)
+    query = query.order_by(User.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def user_activity_averages(role=None) -> Tuple[float, float]:
+    """``(mean login count, mean per-user average score)`` over every user matching ``role``.
+
+    A user's average score is ``score_sum / submissions`` (0 without submissions),
+    as in ``/api/stats``. One statement, whatever page of rows the caller shows.
+    """
+    rows = user_activity_query(role).subquery()
+    user_avg = case((rows.c.submissions > 0, cast(rows.c.score_sum, Float) / rows.c.submissions), else_=0.0)
+    avg_login, avg_score = db.session.query(
+        func.avg(cast(rows.c.login_count, Float)), func.avg(user_avg)
+    ).one()
+    return float(avg_login or 0), float(avg_score or 0)
+
+
+GRADEBOOK_SORTS = ('id', 'avg')
+
+
+def encode_gradebook_cursor(sort: str, row) -> str:
+    """Opaque keyset cursor pointing just after ``row``."""
+    if sort == 'avg':
+        return f"{row.avg_key!r}_{row.id}"
+    return str(row.id)
+
+
+def decode_gradebook_cursor(sort: str, cursor: Optional[str]) -> Optional[Tuple]:
+    """``(avg_key, id)`` for the avg sort, ``(id,)`` otherwise; None if missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        if sort == 'avg':
+            avg_key, user_id = cursor.rsplit('_', 1)
+            return float(avg_key), int(user_id)
+        return (int(cursor),)
+    except ValueError:
+        return None
+
+
+def gradebook_query(course_id: Optional[int] = None, sort: str = 'id', descending: bool = False,
+                    cursor: Optional[str] = None):
+    """Query for the teacher gradebook rows after ``cursor``, in page order.
+
+    Rows have ``id``, ``username``, ``courses_count``, ``submissions_count``,
+    ``avg_score`` (None when nothing is graded) and ``avg_key`` (the sort key,
+    0 when ungraded). With ``course_id`` only students enrolled in that course are
+    listed and submissions/average are for that course only.
+
+    The per-student numbers are correlated subqueries over indexed foreign keys, so
+    an id-sorted page costs the same whatever the page number. Sorting by average
+    still has to rank every student, but in one statement.
+    """
+    def per_student(aggregate):
+        stmt = select(aggregate).where(Submission.student_id == User.id)
+        if course_id is not None:
+            stmt = stmt.join(Assignment, Assignment.id == Submission.assignment_id) \
+                .where(Assignment.course_id == course_id)
+        return stmt.scalar_subquery()
+
+    courses_count = select(func.count()).where(Enrollment.user_id == User.id).scalar_subquery()
+    submissions_count = per_student(func.count(Submission.id))
+    avg_score = per_student(func.avg(Submission.score))
+
+    students = db.session.query(
+        User.id.label('id'),
+        User.username.label('username'),
+        courses_count.label('courses_count'),
+        submissions_count.label('submissions_count'),
+        avg_score.label('avg_score'),
+        func.coalesce(avg_score, 0.0).label('avg_key'),
+    ).filter(User.role == 'student')
+    if course_id is not None:
+        students = students.filter(
+            select(Enrollment.course_id).where(Enrollment.user_id == User.id, Enrollment.course_id == course_id).exists()
+        )
+    page = students.subquery()
+
+    query = db.session.query(page)
+    after = decode_gradebook_cursor(sort, cursor)
+    if sort == 'avg':
+        # Ties on the average are broken by id, always ascending
+        avg_order = page.c.avg_key.desc() if descending else page.c.avg_key.asc()
+        if after is not None:
+            beyond = page.c.avg_key < after[0] if descending else page.c.avg_key > after[0]
+            query = query.filter(or_(beyond, and_(page.c.avg_key == after[0], page.c.id > after[1])))
+        query = query.order_by(avg_order, page.c.id)
+    else:
+        if after is not None:
+            query = query.filter(page.c.id < after[0] if descending else page.c.id > after[0])
+        query = query.order_by(page.c.id.desc() if descending else page.c.id)
+    return query
+
+
+def gradebook_page(course_id: Optional[int] = None, sort: str = 'id', descending: bool = False,
+                   cursor: Optional[str] = None, limit: int = 50) -> Tuple[List[Any], Optional[str]]:
+    """One page of the teacher gradebook and the cursor of the next page (None on the last page)."""
+    rows = gradebook_query(course_id, sort, descending, cursor).limit(limit + 1).all()
+    next_cursor = encode_gradebook_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
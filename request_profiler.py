@@ -0,0 +1,164 @@
+"""On-demand profiling of single requests.
+
+A teacher adds ``?_profile=1`` to a URL (or sends ``X-Profile: 1``) and that one
+request runs under cProfile, while a sampler thread records the request
+thread's call stack every ``interval`` seconds. Three files are written to
+``directory``:
+
+- ``<id>.prof``: cProfile stats, for ``python -m pstats`` or snakeviz;
+- ``<id>.collapsed``: sampled stacks in collapsed format
+  (``root;caller;callee count``), for flamegraph.pl or speedscope;
+- ``<id>.json``: route, status, duration and user, shown on the listing page.
+
+Only the newest ``keep`` profiles are kept. One request is profiled at a time
+per process; a second request asking for a profile meanwhile runs normally.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from flask import g, request
+from flask_login import current_user
+
+PROFILE_KINDS = ('prof', 'collapsed')
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread, sampled every ``interval`` seconds."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self._done.set()
+        self.join()
+        return self.stacks
+
+
+class RequestProfiler:
+    def __init__(self, app, directory: str, keep: int = 50, interval: float = 0.005):
+        self.directory = directory
+        self.keep = keep
+        self.interval = interval
+        self._busy = threading.Lock()
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._abandon)
+
+    @staticmethod
+    def requested() -> bool:
+        return request.args.get('_profile') == '1' or request.headers.get('X-Profile') == '1'
+
+    def _start(self):
+        if not self.requested() or not current_user.is_authenticated or not current_user.is_teacher():
+            return
+        if not self._busy.acquire(blocking=False):
+            return
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profiler = cProfile.Profile()
+        g.request_profile = (profiler, sampler, time.perf_counter())
+        sampler.start()
+        profiler.enable()
+
+    def _finish(self, response):
+        state = g.pop('request_profile', None)
+        if state is None:
+            return response
+        profiler, sampler, started = state
+        try:
+            profiler.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+            stacks = sampler.stop()
+            profile_id = self._save(profiler, stacks, {
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 1),
+                'samples': sum(stacks.values()),
+                'user': current_user.username,
+            })
+            response.headers['X-Profile-Id'] = profile_id
+        finally:
+            self._busy.release()
+        return response
+
+    def _abandon(self, exc=None):
+        # The request failed before after_request ran: stop profiling, save nothing
+        state = g.pop('request_profile', None)
+        if state is not None:
+            profiler, sampler, _ = state
+            profiler.disable()
+            sampler.stop()
+            self._busy.release()
+
+    def _save(self, profiler: cProfile.Profile, stacks: Counter, meta: Dict[str, Any]) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        created = datetime.now()
+        profile_id = f"{created:%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+        base = os.path.join(self.directory, profile_id)
+        profiler.dump_stats(base + '.prof')
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        meta = dict(meta, id=profile_id, created=created.isoformat(timespec='seconds'))
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._prune()
+        return profile_id
+
+    def _ids(self) -> List[str]:
+        """Stored profile ids, newest first (ids start with their timestamp)."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((name[:-5] for name in names if name.endswith('.json')), reverse=True)
+
+    def _prune(self):
+        for profile_id in self._ids()[self.keep:]:
+            for kind in PROFILE_KINDS + ('json',):
+                try:
+                    os.remove(os.path.join(self.directory, f'{profile_id}.{kind}'))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Metadata of the stored profiles, newest first."""
+        profiles = []
+        for profile_id in self._ids():
+            try:
+                with open(os.path.join(self.directory, profile_id + '.json'), encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            profiles.append(meta)
+        return profiles
+
+    def path_of(self, profile_id: str, kind: str) -> Optional[str]:
+        """File of a stored profile, or None for an unknown id or kind."""
+        if kind not in PROFILE_KINDS or profile_id not in self._ids():
+            return None
+        return os.path.join(self.directory, f'{profile_id}.{kind}')
@@ -0,0 +1,211 @@
+"""Daily activity rollups and archival of cold ``Log`` rows.
+
+``LogDailyRollup`` holds per-day counts for every log row with an id up to the
+``RollupState`` watermark. Counts are read as the rollup sums plus the raw rows
+after the watermark (the recent tail), so they stay exact even for log rows that
+arrive late or backdated. ``roll_up_logs`` moves the watermark forward; it runs
+from the activity-log flusher once a day and from ``flask rollup-logs``.
+
+Ids are handed out when a row is inserted but become visible when its
+transaction commits, and on PostgreSQL (unlike SQLite, which has one writer)
+a lower id can commit after a higher one. Moving the watermark past such a row
+before it commits would leave it out of both the rollups and the tail, so the
+watermark only moves up to the newest row older than ``SAFETY_LAG``. This
+assumes log rows are written within ``SAFETY_LAG`` of their timestamp, which
+holds for the activity-log sink; bulk loads of backdated rows (``flask
+gen-data``) should not run while the app is writing logs.
+
+``archive_logs`` moves raw rows that are already rolled up and older than the
+retention window into gzip CSV files, one per day
+(``<dir>/YYYY/MM/log-YYYY-MM-DD.csv.gz``), and deletes them from the table.
+"""
+import csv
+import gzip
+import io
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import func, union_all
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import Log, LogDailyRollup, RollupState
+
+LOG_ROLLUP = 'log'
+# Log rows newer than this may still be uncommitted under a lower id; see the module docstring
+SAFETY_LAG = timedelta(minutes=10)
+ARCHIVE_COLUMNS = ['id', 'user_id', 'course_id', 'action', 'timestamp']
+
+
+def watermark_subquery():
+    """Scalar subquery for the current log watermark, so reads see a single consistent value."""
+    return db.session.query(func.coalesce(func.max(RollupState.last_id), 0)) \
+        .filter(RollupState.name == LOG_ROLLUP) \
+        .scalar_subquery()
+
+
+def roll_up_logs(lag: timedelta = SAFETY_LAG) -> int:
+    """Roll up log rows after the watermark. Returns the number of rows rolled up.
+
+    The watermark moves to the newest row older than ``lag``, never past rows that
+    may still be uncommitted (see ``SAFETY_LAG``). It is advanced with a
+    compare-and-swap in the same transaction as the insert, so concurrent callers
+    (several workers) never count a row twice. This commits (or rolls back) the
+    session, so call it outside request transactions.
+    """
+    state = db.session.get(RollupState, LOG_ROLLUP)
+    low = state.last_id if state else 0
+    # Newest first: the scan stops at the first row older than the lag
+    high = db.session.query(Log.id).filter(Log.timestamp < datetime.utcnow() - lag) \
+        .order_by(Log.id.desc()).limit(1).scalar() or 0
+    if high <= low:
+        db.session.rollback()
+        return 0
+
+    if state is None:
+        try:
+            db.session.add(RollupState(name=LOG_ROLLUP, last_id=high))
+            db.session.flush()
+        except IntegrityError:
+            # Another process created the state row first
+            db.session.rollback()
+            return 0
+    else:
+        swapped = db.session.query(RollupState) \
+            .filter(RollupState.name == LOG_ROLLUP, RollupState.last_id == low) \
+            .update({RollupState.last_id: high, RollupState.updated_at: datetime.utcnow()},
+                    synchronize_session=False)
+        if not swapped:
+            db.session.rollback()
+            return 0
+
+    in_range = (Log.id > low) & (Log.id <= high)
+    day = func.date(Log.timestamp)
+    select = db.session.query(day, Log.user_id, Log.course_id, Log.action, func.count(Log.id)) \
+        .filter(in_range) \
+        .group_by(day, Log.user_id, Log.course_id, Log.action)
+    db.session.execute(
+        LogDailyRollup.__table__.insert().from_select(
+            ['day', 'user_id', 'course_id', 'action', 'count'], select.statement
+        )
+    )
+    rolled = db.session.query(func.count(Log.id)).filter(in_range).scalar()
+    db.session.commit()
+    return rolled
+
+
+def action_counts(user_id: Optional[int] = None) -> Dict[str, int]:
+    """Number of log rows per action, optionally for one user."""
+    watermark = watermark_subquery()
+    rolled = db.session.query(LogDailyRollup.action.label('action'), func.sum(LogDailyRollup.count).label('n'))
+    tail = db.session.query(Log.action.label('action'), func.count(Log.id).label('n')).filter(Log.id > watermark)
+    if user_id is not None:
+        rolled = rolled.filter(LogDailyRollup.user_id == user_id)
+        tail = tail.filter(Log.user_id == user_id)
+    parts = union_all(rolled.group_by(LogDailyRollup.action).statement,
+                      tail.group_by(Log.action).statement).subquery()
+    rows = db.session.query(parts.c.action, func.sum(parts.c.n)).group_by(parts.c.action).all()
+    return {action: int(count) for action, count in rows}
+
+
+def user_action_count_subquery(action: str):
+    """Subquery of ``(user_id, n)``: per-user count of ``action`` (rollups plus tail)."""
+    watermark = watermark_subquery()
+    rolled = db.session.query(LogDailyRollup.user_id.label('user_id'), func.sum(LogDailyRollup.count).label('n')) \
+        .filter(LogDailyRollup.action == action) \
+        .group_by(LogDailyRollup.user_id)
+    tail = db.session.query(Log.user_id.label('user_id'), func.count(Log.id).label('n')) \
+        .filter(Log.id > watermark, Log.action == action) \
+        .group_by(Log.user_id)
+    parts = union_all(rolled.statement, tail.statement).subquery()
+    return db.session.query(parts.c.user_id.label('user_id'), func.sum(parts.c.n).label('n')) \
+        .group_by(parts.c.user_id) \
+        .subquery()
+
+
+def user_action_counts(action: str, user_ids=None) -> Dict[int, int]:
+    """``{user_id: count}`` of ``action``, optionally restricted to ``user_ids``."""
+    counts = user_action_count_subquery(action)
+    query = db.session.query(counts.c.user_id, counts.c.n)
+    if user_ids is not None:
+        query = query.filter(counts.c.user_id.in_(list(user_ids)))
+    return {user_id: int(n) for user_id, n in query.all()}
+
+
+def archive_path(directory: str, day: date) -> str:
+    return os.path.join(directory, f"{day:%Y}", f"{day:%m}", f"log-{day:%Y-%m-%d}.csv.gz")
+
+
+def archive_logs(before: datetime, directory: str, batch_size: int = 5000) -> Dict[str, int]:
+    """Move rolled-up log rows with ``timestamp < before`` into per-day gzip CSV files.
+
+    Only rows up to the watermark are moved, so every deleted row has been counted
+    in the rollups (see ``SAFETY_LAG``). Rows are streamed in timestamp order, so only one archive file is open at a time.
+    Files are appended to when the same day is archived again.
+    """
+    roll_up_logs()
+    state = db.session.get(RollupState, LOG_ROLLUP)
+    watermark = state.last_id if state else 0
+    cold = (Log.timestamp < before) & (Log.id <= watermark)
+
+    days = rows = 0
+    current_day = handle = writer = None
+    query = db.session.query(Log.id, Log.user_id, Log.course_id, Log.action, Log.timestamp) \
+        .filter(cold) \
+        .order_by(Log.timestamp, Log.id) \
+        .yield_per(batch_size)
+    try:
+        for row in query:
+            day = row.timestamp.date()
+            if day != current_day:
+                if handle is not None:
+                    handle.close()
+                path = archive_path(directory, day)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                is_new = not os.path.exists(path)
+                handle = io.TextIOWrapper(gzip.open(path, 'ab'), encoding='utf-8', newline='')
+                writer = csv.writer(handle)
+                if is_new:
+                    writer.writerow(ARCHIVE_COLUMNS)
+                current_day = day
+                days += 1
+            writer.writerow([row.id, row.user_id, row.course_id if row.course_id is not None else '',
+                             row.action, row.timestamp.isoformat()])
+            rows += 1
+    finally:
+        if handle is not None:
+            handle.close()
+
+    # Same predicate as the export; rows added meanwhile are after the watermark
+    db.session.query(Log).filter(cold).delete(synchronize_session=False)
+    db.session.commit()
+    return {'days': days, 'rows': rows}
+
+
+def iter_archived_logs(directory: str, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[dict]:
+    """Yield archived log rows as dicts for days in ``[start, end]``."""
+    if not os.path.isdir(directory):
+        return
+    for root, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            if not (name.startswith('log-') and name.endswith('.csv.gz')):
+                continue
+            day = date.fromisoformat(name[len('log-'):-len('.csv.gz')])
+            if (start and day < start) or (end and day > end):
+                continue
+            with gzip.open(os.path.join(root, name), 'rt', encoding='utf-8', newline='') as handle:
+                for record in csv.DictReader(handle):
+                    yield {
+                        'id': int(record['id']),
+                        'user_id': int(record['user_id']),
+                        'course_id': int(record['course_id']) if record['course_id'] else None,
+                        'action': record['action'],
+                        'timestamp': datetime.fromisoformat(record['timestamp']),
+                    }
+
+
+def load_archived_logs(directory: str, start: Optional[date] = None, end: Optional[date] = None):
+    """Archived log rows as a pandas DataFrame, for ad-hoc analysis."""
+    import pandas as pd
+    return pd.DataFrame(list(iter_archived_logs(directory, start, end)), columns=ARCHIVE_COLUMNS)
@@ -0,0 +1,318 @@
+"""Benchmark the hot routes at several data scales, with per-route query budgets.
+
+For each scale a fresh SQLite database is filled by ``flask gen-data``, then each
+route below is requested through the Flask test client as a logged-in teacher or
+student. Write routes (``WRITE_ROUTES``) get fresh input for every request, built
+before the request and outside its timing. For every route it records latency
+percentiles, the peak Python memory allocated during one request (tracemalloc)
+and the number of SQL statements per request. A route that runs more
+statements than its budget in ``scripts/route_budgets.json`` fails the run
+(exit code 1), so an N+1 loop is caught before it reaches production. Results
+are written as JSON; pass an earlier result with ``--compare`` to print the
+change per route.
+
+    python scripts/bench_routes.py --scales 1k,10k --output bench_routes.json
+    python scripts/bench_routes.py --scales 1k,10k,100k --compare bench_routes.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BUDGETS_FILE = os.path.join(ROOT, 'scripts', 'route_budgets.json')
+
+# (role, path); {course_id} is the course with the most students
+ROUTES = [
+    ('teacher', '/'),
+    ('teacher', '/courses'),
+    ('teacher', '/grades'),
+    ('teacher', '/analytics'),
+    ('teacher', '/ai-support'),
+    ('teacher', '/api/stats'),
+    ('teacher', '/api/analytics'),
+    ('teacher', '/courses/{course_id}/students'),
+    ('student', '/'),
+    ('student', '/courses'),
+    ('student', '/grades'),
+    ('student', '/analytics'),
+    ('student', '/ai-support'),
+    ('student', '/api/analytics'),
+]
+PASSWORDS = {'teacher': 'teacher123', 'student': 'student123'}
+
+
+def bulk_grades_request(course_id):
+    """Regrade every submission of the course: the ungraded ones on the first run, new scores after."""
+    from database import db
+    from models import Assignment, Submission
+
+    submissions = db.session.query(Submission.id, Submission.score) \
+        .join(Assignment, Assignment.id == Submission.assignment_id) \
+        .filter(Assignment.course_id == course_id).order_by(Submission.id).all()
+    grades = [{'submission_id': submission_id, 'score': round(((score or 0.0) + 0.5) % 10, 1)}
+              for submission_id, score in submissions]
+    return '/api/grades/bulk', {'json': {'grades': grades}}
+
+
+def delete_course_request(course_id):
+    """A new course of teacher1 that a student has viewed: the log row references the course."""
+    from database import db
+    from models import User, Course, Log
+
+    teacher_id = db.session.query(User.id).filter(User.username == 'teacher1').scalar()
+    student_id = db.session.query(User.id).filter(User.username == 'student1').scalar()
+    course = Course(name='Khóa học tạm', teacher_id=teacher_id)
+    db.session.add(course)
+    db.session.flush()
+    db.session.add(Log(user_id=student_id, course_id=course.id, action='view_course'))
+    db.session.commit()
+    return f'/courses/{course.id}/delete', {}
+
+
+# (role, method path, build, expected status); ``build(course_id)`` runs before each
+# request, in an app context, and returns the URL and the test client arguments
+WRITE_ROUTES = [
+    ('teacher', 'POST /api/grades/bulk', bulk_grades_request, 200),
+    ('teacher', 'POST /courses/{course_id}/delete', delete_course_request, 302),
+]
+
+
+def parse_scales(value):
+    from datagen import parse_count
+    return [parse_count(part) for part in value.split(',') if part.strip()]
+
+
+def route_key(role, path):
+    return f'{role} {path}'
+
+
+class QueryCounter:
+    """Counts the SQL statements sent through an engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def seed(app, students, logs_per_student, seed_value):
+    courses = max(20, students // 100)
+    result = app.test_cli_runner().invoke(args=[
+        'gen-data', '--students', str(students), '--courses', str(courses),
+        '--logs', str(students * logs_per_student), '--seed', str(seed_value),
+    ])
+    if result.exit_code != 0:
+        raise RuntimeError(f'gen-data failed:\n{result.output}')
+
+
+def busiest_course():
+    from sqlalchemy import func
+    from database import db
+    from models import Enrollment
+
+    return db.session.query(Enrollment.course_id).group_by(Enrollment.course_id) \
+        .order_by(func.count().desc(), Enrollment.course_id).limit(1).scalar()
+
+
+def login(client, role):
+    response = client.post('/login', data={'username': f'{role}1', 'password': PASSWORDS[role]})
+    if response.status_code != 302:
+        raise RuntimeError(f'could not log in as {role}1')
+
+
+def measure(client, counter, build, repeat, warmup):
+    """``build()`` returns ``(method, url, client arguments)`` for the next request."""
+    for _ in range(warmup):
+        method, url, kwargs = build()
+        client.open(url, method=method, **kwargs)
+
+    samples = []
+    for _ in range(repeat):
+        method, url, kwargs = build()
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        response.get_data()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    # One more request, traced, for the statement count and peak memory
+    method, url, kwargs = build()
+    before = counter.count
+    tracemalloc.start()
+    response = client.open(url, method=method, **kwargs)
+    response.get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    queries = counter.count - before
+
+    cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    return {
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(cuts[94], 2),
+        'max_ms': round(max(samples), 2),
+        'peak_kb': round(peak / 1024, 1),
+        'queries': queries,
+    }
+
+
+def run_scale(students, args, budgets):
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from app import create_app
+    from database import db
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    results = {}
+    with app.app_context():
+        started = time.perf_counter()
+        seed(app, students, args.logs_per_student, args.seed)
+        print(f'\n{students} students (seeded in {time.perf_counter() - started:.1f}s), '
+              f'{args.repeat} requests per route')
+        course_id = busiest_course()
+        engine = db.engine
+    # Requests run outside this app context: each one must get its own ``g`` (and current_user)
+    counter = QueryCounter(engine)
+    clients = {}
+
+    def client_for(role):
+        if role not in clients:
+            clients[role] = app.test_client()
+            login(clients[role], role)
+        return clients[role]
+
+    def get(url):
+        return lambda: ('GET', url, {})
+
+    def write(method, build_request):
+        def build():
+            with app.app_context():
+                url, kwargs = build_request(course_id)
+            return method, url, kwargs
+        return build
+
+    routes = [(role, path, get(path.format(course_id=course_id)), 200) for role, path in ROUTES]
+    for role, route, build_request, expected in WRITE_ROUTES:
+        method, path = route.split(' ', 1)
+        routes.append((role, route, write(method, build_request), expected))
+    for role, path, build, expected in routes:
+        key = route_key(role, path)
+        result = measure(client_for(role), counter, build, args.repeat, args.warmup)
+        result['expected'] = expected
+        result['budget'] = budgets.get(key)
+        results[key] = result
+        print_row(key, result)
+    engine.dispose()
+    return results
+
+
+def print_row(key, result):
+    flag = ''
+    if result['status'] != result['expected']:
+        flag = f"  HTTP {result['status']}"
+    elif result['budget'] is not None and result['queries'] > result['budget']:
+        flag = f"  OVER BUDGET ({result['budget']})"
+    print(f"  {key:40} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+          f"peak {result['peak_kb']:9.1f}KB  {result['queries']:4} queries{flag}")
+
+
+def failures(report):
+    failed = []
+    for scale, routes in report['scales'].items():
+        for key, result in routes.items():
+            if result['status'] != result['expected']:
+                failed.append(f"{scale} students, {key}: HTTP {result['status']}")
+            elif result['budget'] is None:
+                failed.append(f"{scale} students, {key}: no query budget in {os.path.relpath(BUDGETS_FILE, ROOT)}")
+            elif result['queries'] > result['budget']:
+                failed.append(f"{scale} students, {key}: {result['queries']} queries, budget {result['budget']}")
+    return failed
+
+
+def compare(report, previous):
+    print(f"\nChange since {previous.get('commit') or 'previous run'} (p50, queries):")
+    for scale, routes in report['scales'].items():
+        old_routes = previous.get('scales', {}).get(scale, {})
+        for key, result in routes.items():
+            old = old_routes.get(key)
+            if old is None:
+                continue
+            change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+            queries = f"{old['queries']} -> {result['queries']}" if old['queries'] != result['queries'] else ''
+            print(f"  {scale:>7} {key:40} {old['p50_ms']:8.2f} -> {result['p50_ms']:8.2f}ms ({change:+6.1f}%)  {queries}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=parse_scales, default=parse_scales('1k,10k'),
+                        help='comma-separated student counts, e.g. 1k,10k,100k')
+    parser.add_argument('--repeat', type=int, default=20, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--logs-per-student', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_routes.json', help='where to write the JSON results')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    os.environ.pop('GEMINI_API_KEY', None)
+    os.environ.setdefault('ACTIVITY_LOG_MODE', 'sync')
+    # A repeated statement shape (N+1) fails the request, whatever the scale
+    os.environ.setdefault('SQL_STRICT', '1')
+    with open(BUDGETS_FILE, encoding='utf-8') as f:
+        budgets = json.load(f)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'scales': {},
+    }
+    for students in args.scales:
+        report['scales'][str(students)] = run_scale(students, args, budgets)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nResults written to {args.output}')
+
+    if previous:
+        compare(report, previous)
+
+    failed = failures(report)
+    if failed:
+        print(f'\n{len(failed)} route(s) failed:')
+        for line in failed:
+            print(f'  {line}')
+        return 1
+    print('\nAll routes returned the expected status within their query budgets.')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+"""Compare the FTS5 search index with the LIKE fallback.
+
+Fills a fresh SQLite database with synthetic users, courses and assignments
+(the FTS triggers index them as they are inserted), then times both search
+paths for a few terms and prints the median per search. Run it from the project
+root:
+
+    python scripts/bench_search.py --rows 50000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = ['lập', 'trình', 'python', 'cơ', 'sở', 'dữ', 'liệu', 'mạng', 'máy', 'tính', 'toán',
+         'rời', 'rạc', 'web', 'thiết', 'kế', 'hệ', 'điều', 'hành', 'trí', 'tuệ', 'nhân', 'tạo']
+TERMS = ['python', 'dữ liệu', 'mạng', 'student12', 'thiết kế web', 'zzz']
+
+
+def fill(rows, seed=42):
+    from database import db
+    from models import User, Course, Assignment
+
+    rnd = random.Random(seed)
+    # A few very common words plus a long tail, like real titles and descriptions
+    vocabulary = WORDS + [''.join(rnd.choice('abcdeghiklmnopqrstuvxy') for _ in range(6)) for _ in range(5000)]
+    phrase = lambda n: ' '.join(rnd.choice(WORDS if rnd.random() < 0.2 else vocabulary) for _ in range(n))
+    users = [{'id': i, 'username': f'student{i}', 'role': 'student'} for i in range(1, rows + 1)]
+    courses = [{'id': i, 'name': phrase(3).title(), 'description': phrase(20), 'teacher_id': 1}
+               for i in range(1, rows // 10 + 1)]
+    assignments = [{'id': i, 'course_id': rnd.randint(1, len(courses)), 'title': phrase(4).capitalize()}
+                   for i in range(1, rows + 1)]
+    with db.engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        conn.execute(Course.__table__.insert(), courses)
+        conn.execute(Assignment.__table__.insert(), assignments)
+
+
+def timed(func, term, repeat):
+    from database import db
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = func(term)
+        samples.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    return statistics.median(samples), sum(len(found) for found in results.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help='users and assignments to create')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'search.db')
+
+    from app import create_app
+    from database import db
+    from search import fts_available, fts_search, like_search
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if not fts_available():
+            print('FTS5 is not available in this SQLite build; nothing to compare.')
+            return 1
+        fill(args.rows)
+        print(f"{args.rows} users, {args.rows // 10} courses, {args.rows} assignments; "
+              f"median of {args.repeat} runs, limit {args.limit}\n")
+        print(f"{'term':16} {'LIKE ms':>9} {'hits':>5} {'FTS ms':>9} {'hits':>5}")
+        for term in TERMS:
+            like_ms, like_hits = timed(lambda q: like_search(q, args.limit), term, args.repeat)
+            fts_ms, fts_hits = timed(lambda q: fts_search(q, args.limit), term, args.repeat)
+            print(f"{term:16} {like_ms:9.2f} {like_hits:5} {fts_ms:9.2f} {fts_hits:5}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
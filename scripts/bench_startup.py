@@ -0,0 +1,118 @@
+"""Measure worker cold start: importing ``app``, ``create_app()`` and the first request.
+
+Each run is a fresh Python process, like a new gunicorn worker. The script
+prints the median timings and the slowest imports (``python -X importtime``),
+then fails (exit code 1) if importing plus ``create_app()`` takes longer than
+the budget, or if a heavy optional dependency (pandas, the Gemini SDK,
+matplotlib...) is imported before the first request. Those dependencies must
+load lazily, on first use. Runs share one Jinja bytecode cache directory, so
+the first-request time of later runs shows the benefit of the cache.
+
+    python scripts/bench_startup.py --runs 5 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported by `import app` + create_app()
+HEAVY_MODULES = ['pandas', 'numpy', 'google.generativeai', 'matplotlib', 'seaborn', 'plotly', 'openpyxl', 'openai']
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+client = flask_app.test_client()
+response = client.get('/login')
+served = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'status': response.status_code,
+    'heavy': heavy,
+}}))
+"""
+
+
+def run_child(env, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD.format(heavy=HEAVY_MODULES)]
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'startup failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(importtime_output, top):
+    """Packages imported directly by the app modules, by cumulative time (ms)."""
+    totals = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            package = name.strip()
+            totals[package] = max(totals.get(package, 0), int(cumulative) / 1000)
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1500,
+                        help='maximum median time for import + create_app()')
+    parser.add_argument('--top', type=int, default=12, help='slowest imports to list')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'startup.db')
+    env['JINJA_CACHE_DIR'] = os.path.join(workdir, 'jinja_cache')
+    env['ACTIVITY_LOG_MODE'] = 'sync'
+
+    runs = [run_child(env)[0] for _ in range(args.runs)]
+    _, importtime_output = run_child(env, importtime=True)
+
+    print(f"{'run':>4} {'import':>10} {'create_app':>11} {'1st request':>12}")
+    for number, run in enumerate(runs, start=1):
+        print(f"{number:>4} {run['import_ms']:8.1f}ms {run['create_app_ms']:9.1f}ms {run['first_request_ms']:10.1f}ms")
+    startup = statistics.median(run['import_ms'] + run['create_app_ms'] for run in runs)
+    print(f"\nmedian import + create_app(): {startup:.1f}ms (budget {args.budget_ms:.0f}ms)")
+    print(f"median first request (/login): {statistics.median(run['first_request_ms'] for run in runs):.1f}ms")
+
+    print('\nSlowest imports (cumulative):')
+    for package, ms in slowest_imports(importtime_output, args.top):
+        print(f'  {ms:8.1f}ms  {package}')
+
+    failed = []
+    if startup > args.budget_ms:
+        failed.append(f'start-up takes {startup:.1f}ms, budget {args.budget_ms:.0f}ms')
+    heavy = sorted({name for run in runs for name in run['heavy']})
+    if heavy:
+        failed.append(f"heavy modules imported at start-up: {', '.join(heavy)}")
+    if any(run['status'] != 200 for run in runs):
+        failed.append('GET /login did not return 200')
+    if failed:
+        print('\nFAILED: ' + '; '.join(failed))
+        return 1
+    print('\nStart-up is within budget and imports no heavy optional dependency.')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,84 @@
+"""Check that the hot query shapes are served by an index.
+
+Runs ``EXPLAIN QUERY PLAN`` for each query below against a fresh SQLite schema
+built from ``models.py`` and fails (exit code 1) if any of them does a full
+table scan. Run it from the project root after changing models or queries:
+
+    python scripts/check_query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FULL_SCAN = re.compile(r'^SCAN \w+')
+
+
+def hot_queries():
+    """(name, SQLAlchemy query) pairs for the query shapes used on every page."""
+    from sqlalchemy import func
+    from database import db
+    from models import Course, Enrollment, Assignment, Submission, Log, StudentStats
+    from queries import gradebook_query
+
+    return [
+        ('log by user and action',
+         db.session.query(func.count(Log.id)).filter(Log.user_id == 1, Log.action == 'login')),
+        ('recent logs of courses',
+         Log.query.filter(Log.course_id.in_([1, 2, 3])).order_by(Log.timestamp.desc()).limit(5)),
+        ('submissions of student', Submission.query.filter_by(student_id=1)),
+        ('submissions of assignments', Submission.query.filter(Submission.assignment_id.in_([1, 2, 3]))),
+        ('enrollments of course', Enrollment.query.filter_by(course_id=1)),
+        ('enrollments of user', Enrollment.query.filter_by(user_id=1)),
+        ('assignments of course', Assignment.query.filter_by(course_id=1)),
+        ('courses of teacher', Course.query.filter_by(teacher_id=1)),
+        ('student stats', StudentStats.query.filter_by(user_id=1)),
+        ('gradebook page', gradebook_query(cursor='30').limit(51)),
+    ]
+
+
+def explain(query):
+    from sqlalchemy import text
+    from database import db
+
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+    return [row[-1] for row in rows]
+
+
+def find_full_scans():
+    """Return ``{query name: [plan lines]}`` for every hot query that does a full scan."""
+    failures = {}
+    for name, query in hot_queries():
+        plan = explain(query)
+        if any(FULL_SCAN.match(line) for line in plan):
+            failures[name] = plan
+    return failures
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'plans.db')
+
+    from app import create_app
+    from database import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        failures = find_full_scans()
+        for name, query in hot_queries():
+            status = 'FULL SCAN' if name in failures else 'ok'
+            print(f"{status:9} {name}: {' | '.join(explain(query))}")
+
+    if failures:
+        print(f"\n{len(failures)} hot query shape(s) fall back to a full table scan.")
+        return 1
+    print('\nAll hot query shapes use an index.')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
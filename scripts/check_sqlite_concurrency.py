@@ -0,0 +1,175 @@
+"""Check that SQLite readers and writers do not block each other under the engine profile.
+
+Reader threads repeatedly run an analytics-style aggregate over the ``log``
+table while writer threads insert log rows in short transactions, like
+``login()`` does, and deleter threads create a course with a log row and
+delete it again, like ``delete_course()`` does. The database is opened through
+``create_app()``, so every connection gets the configured PRAGMAs (including
+``foreign_keys``). The run is repeated with ``SQLITE_JOURNAL_MODE=DELETE`` (the
+SQLite default) for comparison. The check fails (exit code 1) if any thread
+gets "database is locked" or any other database error under the profile.
+
+    python scripts/check_sqlite_concurrency.py --seconds 5 --readers 4 --writers 2 --deleters 1
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Worker(threading.Thread):
+    def __init__(self, engine, work, stop):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.work = work
+        self.stop = stop
+        self.latencies = []
+        self.errors = 0
+        self.failure = None
+
+    def run(self):
+        from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            try:
+                self.work(self.engine)
+            except OperationalError:
+                # "database is locked": the busy timeout ran out
+                self.errors += 1
+                continue
+            except SQLAlchemyError as exc:
+                # e.g. a foreign key violation: the work itself is broken, stop here
+                self.failure = exc
+                return
+            self.latencies.append((time.perf_counter() - started) * 1000)
+
+
+def read(engine):
+    from sqlalchemy import func, select
+    from models import Log
+
+    with engine.connect() as conn:
+        conn.execute(select(Log.action, func.count(Log.id)).group_by(Log.action)).all()
+
+
+def write(engine):
+    from models import Log
+
+    with engine.begin() as conn:
+        conn.execute(Log.__table__.insert(), {'user_id': 1, 'action': 'login', 'timestamp': datetime.utcnow()})
+
+
+def delete_course(engine):
+    from sqlalchemy import delete, update
+    from models import Course, Log
+
+    with engine.begin() as conn:
+        course_id = conn.execute(Course.__table__.insert(), {'name': 'Khóa học tạm', 'teacher_id': 1}) \
+            .inserted_primary_key[0]
+        conn.execute(Log.__table__.insert(), {'user_id': 1, 'course_id': course_id, 'action': 'view_course',
+                                              'timestamp': datetime.utcnow()})
+    with engine.begin() as conn:
+        # Like delete_course(): detach the course's logs, then delete the course
+        conn.execute(update(Log).where(Log.course_id == course_id).values(course_id=None))
+        conn.execute(delete(Course).where(Course.id == course_id))
+
+
+def summary(workers):
+    latencies = sorted(ms for worker in workers for ms in worker.latencies)
+    if not latencies:
+        return 0, 0.0, 0.0, sum(worker.errors for worker in workers)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return len(latencies), statistics.median(latencies), p95, sum(worker.errors for worker in workers)
+
+
+def run(journal_mode, args):
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'concurrency.db')
+    if journal_mode:
+        os.environ['SQLITE_JOURNAL_MODE'] = journal_mode
+    else:
+        os.environ.pop('SQLITE_JOURNAL_MODE', None)
+
+    from sqlalchemy import text
+    from app import create_app
+    from database import db
+    from models import User, Log
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        engine = db.engine
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {'id': 1, 'username': 'student1', 'role': 'student'})
+        now = datetime.utcnow()
+        conn.execute(Log.__table__.insert(), [
+            {'user_id': 1, 'action': 'view_material' if n % 3 else 'login', 'timestamp': now}
+            for n in range(args.rows)
+        ])
+    with engine.connect() as conn:
+        mode = conn.execute(text('PRAGMA journal_mode')).scalar()
+
+    stop = threading.Event()
+    readers = [Worker(engine, read, stop) for _ in range(args.readers)]
+    writers = [Worker(engine, write, stop) for _ in range(args.writers)]
+    deleters = [Worker(engine, delete_course, stop) for _ in range(args.deleters)]
+    workers = readers + writers + deleters
+    for worker in workers:
+        worker.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    engine.dispose()
+    failures = [worker.failure for worker in workers if worker.failure is not None]
+    return mode, summary(readers), summary(writers), summary(deleters), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--deleters', type=int, default=1)
+    parser.add_argument('--rows', type=int, default=100000, help='log rows scanned by each read')
+    parser.add_argument('--busy-timeout', type=int, default=1000,
+                        help='SQLITE_BUSY_TIMEOUT (ms) for both runs')
+    args = parser.parse_args()
+    os.environ['SQLITE_BUSY_TIMEOUT'] = str(args.busy_timeout)
+    os.environ.setdefault('SQL_METRICS', '0')
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.deleters} deleters, {args.seconds:g}s, "
+          f"busy timeout {args.busy_timeout}ms\n")
+    groups = ('reads', 'writes', 'deletes')
+    print(f"{'journal':8}" + '  '.join(f" {name:>7} {'p50 ms':>8} {'p95 ms':>8} {'locked':>7}" for name in groups))
+    results = {}
+    for label, journal_mode in (('profile', None), ('DELETE', 'DELETE')):
+        mode, *stats, failures = run(journal_mode, args)
+        results[label] = (stats, failures)
+        print(f"{mode:8}" + '  '.join(f" {n:7} {p50:8.1f} {p95:8.1f} {locked:7}" for n, p50, p95, locked in stats))
+        for failure in failures:
+            print(f"  {label}: {failure}")
+
+    stats, failures = results['profile']
+    if failures:
+        print('\nFAILED: database errors under the engine profile.')
+        return 1
+    if any(locked for _, _, _, locked in stats):
+        print('\nFAILED: "database is locked" under the engine profile.')
+        return 1
+    if not all(n for n, _, _, _ in stats[:2]) or (args.deleters and not stats[2][0]):
+        print('\nFAILED: readers, writers or deleters made no progress under the engine profile.')
+        return 1
+    print('\nUnder the engine profile no reader, writer or deleter hit "database is locked" or another error.')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+"""Full-text search over usernames, courses and assignment titles.
+
+On SQLite with FTS5 the ``search_index`` virtual table holds one row per user,
+course and assignment; its rowid is ``id * 4 + kind code`` so the sync triggers
+can update a row by rowid, and the ``kind`` column lets a query rank only the
+matches of one kind. The table and its triggers are created together with the
+ORM tables (``db.create_all``), by the migrations, or by
+``flask rebuild-search-index``. Results are ranked by bm25, limited, and every
+search term matches as a prefix.
+
+On other backends, or if FTS5 is not compiled in, ``search`` falls back to the
+``LIKE '%q%'`` scan.
+"""
+import logging
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import joinedload
+
+from database import db
+from models import User, Course, Assignment
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'search_index'
+KINDS = {'user': 1, 'course': 2, 'assignment': 3}
+_SOURCES = {
+    # kind: (table, title column, body column or None)
+    'user': ('"user"', 'username', None),
+    'course': ('course', 'name', 'description'),
+    'assignment': ('assignment', 'title', None),
+}
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Engines (by URL) known to have the index, so the check is not repeated per search
+_available = set()
+
+
+def _fold_sql(expression: str) -> str:
+    # unicode61 strips tone marks but keeps đ as its own letter; users often type "d"
+    return f"replace(replace({expression}, 'đ', 'd'), 'Đ', 'D')"
+
+
+def _values(kind: str, row: str = '') -> str:
+    """``rowid, kind, title, body`` SQL for a source row (``row`` is ``'new.'`` inside triggers)."""
+    _, title, body = _SOURCES[kind]
+    body_sql = _fold_sql(f"coalesce({row}{body}, '')") if body else "''"
+    return f"{row}id * 4 + {KINDS[kind]}, '{kind}', {_fold_sql(row + title)}, {body_sql}"
+
+
+def _trigger_sql(kind: str) -> List[str]:
+    table, title, body = _SOURCES[kind]
+    columns = ', '.join(column for column in (title, body) if column)
+    delete_old = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 4 + {KINDS[kind]};"
+    insert_new = f"INSERT INTO {SEARCH_TABLE}(rowid, kind, title, body) VALUES ({_values(kind, 'new.')});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{kind}_ai AFTER INSERT ON {table} "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{kind}_au AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{kind}_ad AFTER DELETE ON {table} "
+        f"BEGIN {delete_old} END",
+    ]
+
+
+def create_search_index(conn) -> bool:
+    """Create the FTS5 table and triggers if missing and fill an empty index. False if unsupported."""
+    if conn.dialect.name != 'sqlite':
+        return False
+    try:
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            f"kind, title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    except Exception as exc:
+        logger.warning('FTS5 không khả dụng, tìm kiếm dùng LIKE: %s', exc)
+        return False
+    for kind in KINDS:
+        for statement in _trigger_sql(kind):
+            conn.exec_driver_sql(statement)
+    if conn.exec_driver_sql(f"SELECT count(*) FROM {SEARCH_TABLE}").scalar() == 0:
+        rebuild_search_index(conn)
+    return True
+
+
+def rebuild_search_index(conn) -> int:
+    """Refill the index from the source tables. Returns the number of indexed rows."""
+    conn.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE}")
+    for kind, (table, _, _) in _SOURCES.items():
+        conn.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}(rowid, kind, title, body) SELECT {_values(kind)} FROM {table}")
+    return conn.exec_driver_sql(f"SELECT count(*) FROM {SEARCH_TABLE}").scalar()
+
+
+def drop_search_index(conn) -> None:
+    if conn.dialect.name != 'sqlite':
+        return
+    for kind in KINDS:
+        for suffix in ('ai', 'au', 'ad'):
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{kind}_{suffix}")
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _after_create(target, connection, **kw):
+    if create_search_index(connection):
+        _available.add(str(connection.engine.url))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _before_drop(target, connection, **kw):
+    _available.discard(str(connection.engine.url))
+    drop_search_index(connection)
+
+
+def fts_available() -> bool:
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+    key = str(engine.url)
+    if key not in _available:
+        found = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}
+        ).first()
+        if found is None:
+            return False
+        _available.add(key)
+    return True
+
+
+def match_expression(q: str) -> Optional[str]:
+    """FTS5 query where every word of ``q`` must match as a prefix; None if ``q`` has no words."""
+    tokens = _TOKEN.findall(q.replace('đ', 'd').replace('Đ', 'D'))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _load_in_order(model, ids: List[int], *options) -> list:
+    if not ids:
+        return []
+    found = {obj.id: obj for obj in model.query.options(*options).filter(model.id.in_(ids)).all()}
+    return [found[i] for i in ids if i in found]
+
+
+def fts_search(q: str, limit: int = 20) -> Dict[str, list]:
+    expression = match_expression(q)
+    results = {'users': [], 'courses': [], 'assignments': []}
+    if expression is None:
+        return results
+    for kind, model, key, options in (('user', User, 'users', ()), ('course', Course, 'courses', ()),
+                                      ('assignment', Assignment, 'assignments', (joinedload(Assignment.course),))):
+        ids = db.session.execute(
+            text(f"SELECT rowid / 4 FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+                 f"ORDER BY rank LIMIT :limit"),
+            {'match': f"kind : {kind} AND {{title body}} : ({expression})", 'limit': limit},
+        ).scalars().all()
+        results[key] = _load_in_order(model, ids, *options)
+    return results
+
+
+def like_search(q: str, limit: int = 20) -> Dict[str, list]:
+    pattern = f"%{q}%"
+    return {
+        'users': User.query.filter(User.username.ilike(pattern)).limit(limit).all(),
+        'courses': Course.query.filter(Course.name.ilike(pattern)).limit(limit).all(),
+        'assignments': Assignment.query.options(joinedload(Assignment.course))
+            .filter(Assignment.title.ilike(pattern)).limit(limit).all(),
+    }
+
+
+def search(q: str, limit: int = 20) -> Dict[str, list]:
+    """``{'users': [...], 'courses': [...], 'assignments': [...]}``, at most ``limit`` of each."""
+    if fts_available():
+        return fts_search(q, limit)
+    return like_search(q, limit)
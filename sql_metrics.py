@@ -0,0 +1,107 @@
+"""Per-request SQL statistics and an N+1 detector.
+
+Engine events count and time every statement run while a request is being
+handled. Statements are also grouped by shape: the SQL text with literals,
+bound parameters and ``IN (...)`` lists collapsed, so the same query for a
+different id has the same shape. A shape run more than ``threshold`` times in
+one request is almost always a loop issuing one query per row (N+1).
+
+Each response gets a ``Server-Timing: db;dur=<ms>;desc="<n> queries"`` header,
+and one line per request is logged at INFO on this module's logger. Suspected
+N+1 shapes are logged as warnings; in strict mode (``SQL_STRICT=1``, for tests
+and benchmarks) they raise ``NPlusOneError`` instead.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from typing import List, Tuple
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'%\(\w+\)s|%s|:\w+|\$\d+|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+class NPlusOneError(RuntimeError):
+    """A request ran the same statement shape more times than allowed."""
+
+
+def normalize_sql(statement: str) -> str:
+    """Shape of a statement: literals and parameters become ``?``, IN lists ``IN (?)``."""
+    shape = _STRING.sub('?', statement)
+    shape = _PARAM.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (?)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class RequestSQLStats:
+    __slots__ = ('count', 'seconds', 'shapes')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Shapes executed more than ``threshold`` times, most frequent first."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+class SQLMetrics:
+    def __init__(self, app, engines, threshold: int = 10, strict: bool = False):
+        self.threshold = threshold
+        self.strict = strict
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    @staticmethod
+    def current() -> RequestSQLStats:
+        """Statistics of the request being handled, or None outside a request."""
+        return g.get('sql_stats') if has_app_context() else None
+
+    def _start_request(self):
+        g.sql_stats = RequestSQLStats()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._sql_metrics_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = self.current()
+        if stats is None:
+            # Not in a request (CLI, background flusher thread)
+            return
+        started = getattr(context, '_sql_metrics_started', None)
+        if started is not None:
+            stats.seconds += time.perf_counter() - started
+        stats.count += 1
+        stats.shapes[normalize_sql(statement)] += 1
+
+    def _finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        duration_ms = stats.seconds * 1000
+        response.headers.add('Server-Timing', f'db;dur={duration_ms:.1f};desc="{stats.count} queries"')
+        logger.info('%s %s %s: %d queries, %.1f ms SQL', request.method, request.path,
+                    response.status_code, stats.count, duration_ms)
+
+        repeated = stats.repeated(self.threshold)
+        for shape, n in repeated:
+            logger.warning('Possible N+1 in %s %s: %d x %s', request.method, request.path, n, shape[:300])
+        if repeated and self.strict:
+            shape, n = repeated[0]
+            raise NPlusOneError(f'{request.method} {request.path} ran the same statement {n} times '
+                                f'(limit {self.threshold}): {shape[:300]}')
+        return response
@@ -0,0 +1,201 @@
+"""Maintenance of the per-user ``StudentStats`` rollup.
+
+The ``record_*`` helpers are called by the views right before they commit, so the
+rollup is updated in the same transaction as the row that changes it. When a user
+has no rollup row yet (e.g. data created by the seeders or before the table
+existed) the row is built from the raw tables instead of incremented, and inserted
+with ``INSERT ... ON CONFLICT DO NOTHING`` in case another request creates it first.
+"""
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, func, update
+
+from database import db, insert_ignore
+from models import User, Enrollment, Submission, StudentStats
+from rollups import user_action_counts
+
+
+def compute_student_stats(user_ids: Optional[Iterable[int]] = None) -> Dict[int, StudentStats]:
+    """Compute fresh (transient) ``StudentStats`` from the raw tables.
+
+    Uses one grouped query per source table, for all requested users at once.
+    """
+    ids = list(user_ids) if user_ids is not None else None
+    if ids is not None and not ids:
+        return {}
+
+    def _scoped(query, column):
+        return query.filter(column.in_(ids)) if ids is not None else query
+
+    logins = user_action_counts('login', ids).items()
+    submissions = _scoped(
+        db.session.query(
+            Submission.student_id,
+            func.count(Submission.id),
+            func.count(Submission.score),
+            func.coalesce(func.sum(Submission.score), 0.0),
+        ),
+        Submission.student_id,
+    ).group_by(Submission.student_id).all()
+    enrollments = _scoped(
+        db.session.query(Enrollment.user_id, func.count()), Enrollment.user_id
+    ).group_by(Enrollment.user_id).all()
+
+    if ids is None:
+        ids = [user_id for (user_id,) in db.session.query(User.id).all()]
+    result = {
+        user_id: StudentStats(user_id=user_id, login_count=0, submission_count=0,
+                              graded_count=0, score_sum=0.0, courses_enrolled=0)
+        for user_id in ids
+    }
+    for user_id, count in logins:
+        if user_id in result:
+            result[user_id].login_count = count
+    for user_id, count, graded, score_sum in submissions:
+        if user_id in result:
+            result[user_id].submission_count = count
+            result[user_id].graded_count = graded
+            result[user_id].score_sum = float(score_sum)
+    for user_id, count in enrollments:
+        if user_id in result:
+            result[user_id].courses_enrolled = count
+    return result
+
+
+def get_student_stats(user_id: int) -> StudentStats:
+    """Primary-key lookup of a user's rollup, computed on the fly if it is missing."""
+    stats = db.session.get(StudentStats, user_id)
+    if stats is None:
+        stats = compute_student_stats([user_id])[user_id]
+    return stats
+
+
+def load_student_stats(user_ids: Iterable[int]) -> Dict[int, StudentStats]:
+    """Rollups for many users in one query (plus one batch for any missing rows)."""
+    ids = list(user_ids)
+    if not ids:
+        return {}
+    found = {s.user_id: s for s in StudentStats.query.filter(StudentStats.user_id.in_(ids)).all()}
+    missing = [user_id for user_id in ids if user_id not in found]
+    if missing:
+        found.update(compute_student_stats(missing))
+    return found
+
+
+# Counter columns of ``StudentStats``, in the order ``compute_student_stats`` fills them
+COUNTERS = ('login_count', 'submission_count', 'graded_count', 'score_sum', 'courses_enrolled')
+
+
+def _insert_missing(rows: Iterable[StudentStats]) -> int:
+    """Insert built rollup rows, leaving alone any a concurrent request created first.
+
+    Returns the number of rows inserted; the caller re-reads the rows either way.
+    """
+    return insert_ignore(StudentStats.__table__, [
+        {'user_id': stats.user_id, **{name: getattr(stats, name) for name in COUNTERS}} for stats in rows
+    ])
+
+
+def _stats_for_update(user_id: int) -> Tuple[StudentStats, bool]:
+    """Return ``(row, built)``: the persistent row to increment, creating it if it is missing.
+
+    When the row has to be built, the pending change is flushed first so the
+    computed values already include it; ``built`` is True in that case and the
+    caller must not increment again. If another request inserted the row in the
+    meantime, that row does not include our change and ``built`` is False.
+    """
+    stats = db.session.get(StudentStats, user_id)
+    if stats is not None:
+        return stats, False
+    db.session.flush()
+    built = _insert_missing([compute_student_stats([user_id])[user_id]]) == 1
+    return db.session.get(StudentStats, user_id), built
+
+
+def record_login(user_id: int, write_log: Callable[[], bool]) -> None:
+    """A login happened. ``write_log`` writes its Log row and returns False if it was dropped.
+
+    The rollup row is read, or built from the Log table, before ``write_log`` runs,
+    so it never includes this login, even when the row goes through the
+    background writer and is committed before this transaction.
+    """
+    stats, _ = _stats_for_update(user_id)
+    if write_log():
+        stats.login_count += 1
+
+
+def record_submission(student_id: int) -> None:
+    """A new, ungraded submission was added."""
+    stats, built = _stats_for_update(student_id)
+    if not built:
+        stats.submission_count += 1
+
+
+def record_grade(student_id: int, old_score: Optional[float], new_score: Optional[float]) -> None:
+    """A submission's score changed from ``old_score`` to ``new_score``."""
+    stats, built = _stats_for_update(student_id)
+    if not built:
+        stats.graded_count += (new_score is not None) - (old_score is not None)
+        stats.score_sum += (new_score or 0.0) - (old_score or 0.0)
+
+
+def _record_many(deltas: Dict[int, Tuple[Any, ...]], columns: Tuple[str, ...]) -> None:
+    """Add per-user ``deltas`` (one value per name in ``columns``) to the rollup rows.
+
+    Missing rows are first inserted in one batch, built from the raw tables minus
+    the deltas; then every row is updated by one executemany that always sets every
+    column in ``columns``. The changes must already be written in the session's
+    transaction.
+    """
+    if not deltas:
+        return
+    db.session.flush()
+    existing = {
+        user_id for (user_id,) in
+        db.session.query(StudentStats.user_id).filter(StudentStats.user_id.in_(list(deltas))).all()
+    }
+    missing = compute_student_stats([user_id for user_id in deltas if user_id not in existing])
+    for user_id, stats in missing.items():
+        # Leave the deltas out, so the update below adds them whoever inserts the row
+        for name, value in zip(columns, deltas[user_id]):
+            setattr(stats, name, getattr(stats, name) - value)
+    if missing:
+        _insert_missing(missing.values())
+    table = StudentStats.__table__
+    statement = update(table).where(table.c.user_id == bindparam('stats_user_id')).values(
+        {name: table.c[name] + bindparam(f'delta_{name}') for name in columns})
+    db.session.execute(statement, [
+        {'stats_user_id': user_id, **{f'delta_{name}': value for name, value in zip(columns, deltas[user_id])}}
+        for user_id in sorted(deltas)
+    ])
+
+
+def record_grades(changes: Iterable[Tuple[int, Optional[float], Optional[float]]]) -> None:
+    """Bulk ``record_grade`` for ``(student_id, old_score, new_score)`` changes."""
+    deltas: Dict[int, Tuple[int, float]] = {}
+    for student_id, old_score, new_score in changes:
+        graded, total = deltas.get(student_id, (0, 0.0))
+        deltas[student_id] = (graded + (new_score is not None) - (old_score is not None),
+                              total + (new_score or 0.0) - (old_score or 0.0))
+    _record_many(deltas, ('graded_count', 'score_sum'))
+
+
+def record_enrollment(user_id: int, delta: int) -> None:
+    """The user was enrolled (``delta=1``) or unenrolled (``delta=-1``) from a course."""
+    stats, built = _stats_for_update(user_id)
+    if not built:
+        stats.courses_enrolled += delta
+
+
+def record_enrollments(deltas: Dict[int, int]) -> None:
+    """Bulk ``record_enrollment``: ``{user_id: change in number of enrolled courses}``."""
+    _record_many({user_id: (delta,) for user_id, delta in deltas.items() if delta}, ('courses_enrolled',))
+
+
+def rebuild_student_stats() -> int:
+    """Recompute every rollup row from the raw tables. Returns the number of rows."""
+    fresh = compute_student_stats()
+    StudentStats.query.delete()
+    db.session.add_all(fresh.values())
+    db.session.commit()
+    return len(fresh)
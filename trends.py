@@ -0,0 +1,106 @@
+"""Monthly activity trend series for the teacher analytics chart.
+
+Counts come from the daily rollups plus the raw log tail (see rollups.py),
+bucketed by month in SQL. Closed months never change, so they are cached for the
+lifetime of the process; only the current month is recomputed after
+``current_ttl`` seconds.
+"""
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, union_all
+
+from database import db
+from models import Log, LogDailyRollup
+from rollups import watermark_subquery
+
+# Log action -> series name in the chart
+TREND_ACTIONS = {'view_material': 'views', 'submit_assignment': 'submissions'}
+
+
+def month_bucket(column):
+    """SQL expression giving 'YYYY-MM' for a date/datetime column on the current backend."""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return func.to_char(func.date_trunc('month', column), 'YYYY-MM')
+    if dialect in ('mysql', 'mariadb'):
+        return func.date_format(column, '%Y-%m')
+    return func.strftime('%Y-%m', column)
+
+
+def month_starts(today: date, months: int) -> List[date]:
+    """First day of each of the last ``months`` calendar months, oldest first."""
+    year, month = today.year, today.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return list(reversed(starts))
+
+
+def monthly_activity_counts(since: date) -> Dict[str, Dict[str, int]]:
+    """``{'YYYY-MM': {'views': n, 'submissions': n}}`` for every month from ``since`` on."""
+    actions = list(TREND_ACTIONS)
+    rolled_month = month_bucket(LogDailyRollup.day)
+    rolled = db.session.query(rolled_month.label('month'), LogDailyRollup.action.label('action'),
+                              func.sum(LogDailyRollup.count).label('n')) \
+        .filter(LogDailyRollup.action.in_(actions), LogDailyRollup.day >= since) \
+        .group_by(rolled_month, LogDailyRollup.action)
+    tail_month = month_bucket(Log.timestamp)
+    tail = db.session.query(tail_month.label('month'), Log.action.label('action'), func.count(Log.id).label('n')) \
+        .filter(Log.id > watermark_subquery(), Log.action.in_(actions),
+                Log.timestamp >= datetime.combine(since, datetime.min.time())) \
+        .group_by(tail_month, Log.action)
+    parts = union_all(rolled.statement, tail.statement).subquery()
+    rows = db.session.query(parts.c.month, parts.c.action, func.sum(parts.c.n)) \
+        .group_by(parts.c.month, parts.c.action).all()
+
+    result: Dict[str, Dict[str, int]] = {}
+    for month, action, count in rows:
+        result.setdefault(month, {name: 0 for name in TREND_ACTIONS.values()})[TREND_ACTIONS[action]] = int(count)
+    return result
+
+
+class MonthlyTrendCache:
+    def __init__(self, current_ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.current_ttl = current_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._closed: Dict[str, Dict[str, int]] = {}
+        self._current: Optional[tuple] = None  # (month key, expires_at, counts)
+
+    def series(self, months: int = 6, today: Optional[date] = None) -> List[dict]:
+        """``[{'month': 'MM/YYYY', 'views': n, 'submissions': n}, ...]``, oldest first."""
+        today = today or datetime.utcnow().date()
+        starts = month_starts(today, months)
+        keys = [f"{start:%Y-%m}" for start in starts]
+        current_key = keys[-1]
+        empty = {name: 0 for name in TREND_ACTIONS.values()}
+
+        with self._lock:
+            missing = [start for start, key in zip(starts[:-1], keys[:-1]) if key not in self._closed]
+            current = self._current
+            current_fresh = current is not None and current[0] == current_key and current[1] > self._clock()
+
+        if missing or not current_fresh:
+            since = missing[0] if missing else starts[-1]
+            counts = monthly_activity_counts(since)
+            with self._lock:
+                for start, key in zip(starts[:-1], keys[:-1]):
+                    if start >= since:
+                        self._closed[key] = counts.get(key, dict(empty))
+                self._current = (current_key, self._clock() + self.current_ttl, counts.get(current_key, dict(empty)))
+
+        with self._lock:
+            values = [self._closed[key] for key in keys[:-1]] + [self._current[2]]
+        return [
+            {'month': f"{start:%m/%Y}", **value}
+            for start, value in zip(starts, values)
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._closed.clear()
+            self._current = None
@@ -0,0 +1,140 @@
+"""Content-addressed storage for uploaded files.
+
+Uploads are never buffered whole in memory: ``UploadRequest`` makes Werkzeug
+write each file part of a multipart body into a temp file inside the store
+while hashing it (SHA-256) chunk by chunk. ``BlobStore.put`` then hard-links
+the temp file to ``<root>/ab/cd/<sha256>``. Identical content (e.g. a
+resubmission of the same file) is stored once, and no directory ever holds more
+than a few hundred entries.
+
+``Submission.file_path`` stores the blob path relative to the store root. Older
+rows hold absolute paths of files saved directly in ``UPLOAD_FOLDER``;
+``BlobStore.resolve`` accepts both.
+
+``send_upload`` serves a stored file without reading it into Python: the WSGI
+server's file wrapper (``sendfile`` under gunicorn/uwsgi), ``X-Sendfile`` when
+``USE_X_SENDFILE`` is on, or nginx's ``X-Accel-Redirect`` when
+``UPLOAD_ACCEL_PREFIX`` is set. Range, ETag/If-None-Match and
+Last-Modified/If-Modified-Since are honoured in every case.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+
+from flask import Request, Response, current_app, request, send_file
+
+CHUNK_SIZE = 64 * 1024
+
+
+class HashingTempFile:
+    """Temp file that hashes everything written to it."""
+
+    def __init__(self, directory: str):
+        # Deleted on close; the blob itself is a hard link made by BlobStore.put
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-')
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class BlobStore:
+    def __init__(self, root: str, chunk_size: int = CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    @staticmethod
+    def blob_name(digest: str) -> str:
+        return os.path.join(digest[:2], digest[2:4], digest)
+
+    def resolve(self, file_path: str) -> str:
+        """Absolute path of a stored ``Submission.file_path``."""
+        return file_path if os.path.isabs(file_path) else os.path.join(self.root, file_path)
+
+    def spool(self) -> HashingTempFile:
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return HashingTempFile(self.tmp_dir)
+
+    def put(self, storage) -> str:
+        """Store an uploaded ``FileStorage``; returns the blob path relative to the root."""
+        stream = storage.stream
+        if isinstance(stream, HashingTempFile):
+            return self._adopt(stream)
+        # Not spooled by UploadRequest (e.g. a file opened by a script): hash while copying
+        spool = self.spool()
+        try:
+            shutil.copyfileobj(stream, spool, self.chunk_size)
+            return self._adopt(spool)
+        finally:
+            spool.close()
+
+    def _adopt(self, spool: HashingTempFile) -> str:
+        spool.flush()
+        name = self.blob_name(spool.hexdigest())
+        target = os.path.join(self.root, name)
+        if os.path.exists(target):
+            return name
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(spool.name, 0o644)
+        try:
+            os.link(spool.name, target)
+        except FileExistsError:
+            # Same content stored concurrently by another request
+            pass
+        except OSError:
+            # No hard links on this filesystem: copy, then rename into place atomically
+            partial = f"{spool.name}.partial"
+            shutil.copyfile(spool.name, partial)
+            os.replace(partial, target)
+        return name
+
+
+class UploadRequest(Request):
+    """Request whose uploaded files are spooled into the app's ``BlobStore``."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        store = current_app.extensions.get('upload_store')
+        if store is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return store.spool()
+
+
+def send_upload(store: BlobStore, file_path: str, download_name: str, accel_prefix: str = ''):
+    """Response that sends a stored upload as an attachment; raises FileNotFoundError if missing."""
+    path = store.resolve(file_path)
+    stat = os.stat(path)
+    # Blobs are named by their SHA-256, which makes a strong ETag for free
+    etag = os.path.basename(path) if not os.path.isabs(file_path) else None
+
+    if accel_prefix and etag:
+        # nginx serves the body (and Range requests) from its internal location
+        response = Response(mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{file_path.replace(os.sep, '/')}"
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            response.headers.pop('X-Accel-Redirect', None)
+    else:
+        response = send_file(path, as_attachment=True, download_name=download_name,
+                             conditional=True, etag=etag or True, max_age=0)
+    # Submissions are personal: never store them in shared caches
+    response.cache_control.private = True
+    return response
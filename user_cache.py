@@ -0,0 +1,81 @@
+"""Per-process cache of the logged-in user for Flask-Login's ``user_loader``.
+
+Without it every authenticated request, including each chat and analytics
+XHR, starts with a ``SELECT ... FROM user``. The cache holds detached
+``UserSnapshot`` objects (id, username, role; no password hash, no session),
+so they can be shared between requests and threads. Views call ``invalidate``
+after committing a change to a user's role, name or password, or deleting
+the user; the TTL bounds staleness across worker processes, which do not
+share the in-memory cache.
+
+Each response says whether the user came from the cache, with the process-wide
+hit rate: ``Server-Timing: user;desc="hit 97.5% of 1200"``.
+"""
+from typing import Optional
+
+from flask import g
+from flask_login import UserMixin
+
+from ai_cache import ResponseCache
+from database import db
+from models import User
+
+
+class UserSnapshot(UserMixin):
+    """Read-only stand-in for ``User`` as ``current_user``."""
+
+    __slots__ = ('id', 'username', 'role')
+
+    def __init__(self, id: int, username: str, role: str):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.id} {self.username!r} {self.role}>'
+
+    def is_student(self):
+        return self.role == 'student'
+
+    def is_teacher(self):
+        return self.role == 'teacher'
+
+
+def load_snapshot(user_id: int) -> Optional[UserSnapshot]:
+    row = db.session.query(User.id, User.username, User.role).filter(User.id == user_id).first()
+    return UserSnapshot(*row) if row is not None else None
+
+
+class UserCache:
+    def __init__(self, app, maxsize: int = 4096, ttl: float = 30.0):
+        self._cache = ResponseCache(maxsize=maxsize, ttl=ttl)
+        app.after_request(self._add_timing)
+
+    def load(self, user_id: int) -> Optional[UserSnapshot]:
+        # Unknown ids are not cached: the id may belong to a user created later
+        user, status = self._cache.get_or_compute(user_id, lambda: load_snapshot(user_id),
+                                                  should_cache=lambda user: user is not None)
+        g.user_cache_status = status
+        return user
+
+    def invalidate(self, *user_ids: int) -> None:
+        for user_id in user_ids:
+            self._cache.delete(user_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _add_timing(self, response):
+        status = g.pop('user_cache_status', None)
+        if status is not None:
+            stats = self.stats()
+            lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+            response.headers.add('Server-Timing',
+                                 f'user;desc="{status} {stats["hit_rate"]:.1%} of {lookups}"')
+        return response